@@ -0,0 +1,140 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+# Shared request budget for Airtable, used by app.py (through pyairtable) and export.py (through httpx)
+#   Airtable allows 5 requests per second per base. After a 429 it asks clients to wait
+#   30 seconds, so a throttled request pauses every thread using the same base.
+
+# Retried for any request: Airtable rejected it before doing anything
+THROTTLED_STATUS = 429
+# Only retried for reads, as a write may have been applied before the error
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+
+class Throttle:
+    """Token bucket for one base's request budget, with retries and counters.
+
+    The rate is halved after a 429 and creeps back up to requests_per_second
+    as requests succeed.
+    """
+    THROTTLED_WAIT = 30.0
+
+    def __init__(self, requests_per_second:float=5, burst:int=5, max_retries:int=5,
+                 base_delay:float=1.0, max_delay:float=30.0, min_rate:float=0.5):
+        self.target_rate = requests_per_second
+        self.rate = requests_per_second
+        self.min_rate = min_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'server_errors': 0, 'failed': 0, 'wait_seconds': 0.0}
+
+    def acquire(self):
+        "Block until a request may be sent"
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.stats['requests'] += 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+                self.stats['wait_seconds'] += wait
+            time.sleep(wait)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.target_rate, self.rate + 0.05)
+
+    def throttled(self, retry_after:Optional[float]=None):
+        with self.lock:
+            self.stats['throttled'] += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            wait = retry_after if retry_after is not None else self.THROTTLED_WAIT
+            self.paused_until = max(self.paused_until, time.monotonic() + wait + random.uniform(0, 1))
+            self.tokens = 0
+
+    def backoff(self, attempt:int) -> float:
+        "Exponential backoff with full jitter"
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def send(self, send:Callable[[], object], method:str='GET'):
+        """Send a request through the bucket, retrying 429s and (for reads) 5xx responses.
+
+        Args:
+            send: sends the request and returns a response with status_code and headers
+            method: HTTP method, to decide whether a server error is safe to retry
+
+        Returns:
+            the last response, which the caller checks for errors as usual
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            response = send()
+            status = response.status_code
+            if status == THROTTLED_STATUS:
+                self.throttled(retry_after_seconds(response))
+            elif status in SERVER_ERROR_STATUSES and method.upper() == 'GET':
+                with self.lock:
+                    self.stats['server_errors'] += 1
+            else:
+                self.succeeded()
+                return response
+            if attempt >= self.max_retries:
+                with self.lock:
+                    self.stats['failed'] += 1
+                return response
+            attempt += 1
+            with self.lock:
+                self.stats['retries'] += 1
+            if status != THROTTLED_STATUS:
+                delay = self.backoff(attempt)
+                with self.lock:
+                    self.stats['wait_seconds'] += delay
+                time.sleep(delay)
+
+    def summary(self) -> str:
+        stats = self.stats
+        return (f"{stats['requests']} Airtable request(s), {stats['retries']} retried "
+                f"({stats['throttled']} rate limited, {stats['server_errors']} server errors), "
+                f"{stats['failed']} failed after retries, {stats['wait_seconds']:.1f}s spent waiting")
+
+def retry_after_seconds(response) -> Optional[float]:
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+_throttles:Dict[str, Throttle] = {}
+_throttles_lock = threading.Lock()
+
+def throttle_for(base_id:str, **options) -> Throttle:
+    "The Throttle shared by everything in this process talking to a base"
+    with _throttles_lock:
+        if base_id not in _throttles:
+            _throttles[base_id] = Throttle(**options)
+        return _throttles[base_id]
+
+def summaries() -> List[str]:
+    with _throttles_lock:
+        return [f"{base_id}: {throttle.summary()}" for base_id, throttle in _throttles.items()]
+
+class ThrottledSession(requests.Session):
+    "requests Session for pyairtable that sends every request through a Throttle"
+    def __init__(self, throttle:Throttle):
+        super().__init__()
+        self.throttle = throttle
+
+    def send(self, request, **kwargs):
+        return self.throttle.send(lambda: super(ThrottledSession, self).send(request, **kwargs), request.method)
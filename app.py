@@ -3,13 +3,20 @@ import csv
 from typing import List, Tuple, Optional, TextIO, Literal
 from pyairtable import Api, formulas, Table, Base
 from pyairtable.api.types import RecordDict
-from pyairtable.models.schema import FieldSchema, TableSchema
+from pyairtable.models.schema import BaseSchema, FieldSchema, TableSchema
 from requests.exceptions import HTTPError
 import argparse
 import json
 from datetime import datetime
+import time
+import sqlite3
+import hashlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 import openpyxl
 import re
+from logs import log, configure_logging, progress, debug_enabled
+import airtable_client
 
 class DuplicateRecordError(Exception):
     pass
@@ -17,88 +24,141 @@ class DuplicateRecordError(Exception):
 class UserQuitOut(Exception):
     pass
 
+# Zeraki subject columns, in the order grades are stored and imported
+ZERAKI_SUBJECTS = ('ENG','KIS','MAT','BIO','PHY','CHE','HIS','GEO','CRE','IRE','BST')
+
+# a subject cell as Zeraki writes it: "64 C+", "64" or "C+"
+GRADE_CELL = re.compile(r'(\d+)(?: ([A-Z][+-]?))?|([A-Z][+-]?)')
+
+def split_grade_cell(csv_grade:str) -> Tuple[Optional[int],Optional[str]]:
+    """Split a subject cell into its numeric and letter grade, token by token.
+
+    Handles any cell, where GRADE_CELL only matches well formed ones.
+    """
+    grade_num = None
+    grade_str = None
+    for grade in csv_grade.split(" "):
+        try:
+            grade_num = int(grade)
+        except:
+            grade_str = grade
+    return grade_num, grade_str
+
+def parse_grade_column(cells:List[str]) -> Tuple[List[Optional[int]],List[Optional[str]],List[int]]:
+    """Parse one subject column of a whole file at once.
+
+    Well formed cells are split by a single GRADE_CELL match each, and anything else falls
+    back to split_grade_cell and is reported as malformed. Empty cells have no grade.
+
+    Returns:
+        Tuple[List[Optional[int]],List[Optional[str]],List[int]]: numeric grades, letter
+            grades (None where there is none) and the positions of the malformed cells
+    """
+    matches = list(map(GRADE_CELL.fullmatch,cells))
+    nums = [int(match[1]) if match is not None and match[1] is not None else None for match in matches]
+    strs = [match[2] or match[3] if match is not None else None for match in matches]
+    malformed = []
+    for pos, match in enumerate(matches):
+        if match is None and cells[pos] != "":
+            nums[pos], strs[pos] = split_grade_cell(cells[pos])
+            malformed.append(pos)
+    return nums, strs, malformed
+
 class ImportRecord:
     # properties:
     # csv_row, zeraki_num, zeraki_name, kcpe, first_name, last_name, at_id, match_type, matched_record, at_edit type
     # grades array of structs with {subj: 'HIS', str: 'B',num: 80}, test_type, test_date, form 
-    def __init__(self,row:List,headers:List,csv_row_num:int) -> bool:
+    # grades are stored compactly in grade_nums and grade_strs, one slot per GRADE_SUBJECTS entry (None if no grade)
+    __slots__ = (
+        'csv_row','zeraki_num','zeraki_name','kcpe','first_name','last_name',
+        'at_id','at_rec_id','match_type','matched_record','at_edit_type',
+        'grad_year','test_type','test_date','form','grade_nums','grade_strs',
+    )
+    GRADE_SUBJECTS = ('Overall',) + ZERAKI_SUBJECTS
+    GRADE_INDEX = {subj: idx for idx,subj in enumerate(GRADE_SUBJECTS)}
+
+    def __init__(self,row:List,headers:List,csv_row_num:int,header_plan:Optional['HeaderPlan']=None,parse_grades:bool=True) -> bool:
         self.csv_row = csv_row_num
-        self.grades = []
-        self.grades.append({'subj':'Overall', 'str': None, 'num': None})
-        for idx,header in enumerate(headers):
-            if header == 'ADMNO':
-                self.zeraki_num = int(row[idx])
-            elif header == 'NAME':
-                self.zeraki_name = row[idx].upper().strip()
-                self.parse_names()
-            elif header == 'KCPE':
-                try:
-                    self.kcpe = int(row[idx])
-                except ValueError:
-                    pass
-            elif header == 'TT PTS':
-                try:
-                    self.grades[0]['num'] = float(row[idx])
-                    print(f"Student {self.zeraki_name} has an overall numeric grade of {float(row[idx])}.")
-                except ValueError:
-                    print(f"numeric grade expected for TT PTS")
-                    pass
-                except (IndexError,KeyError):
-                    print(f"corrupt grades property in import record for znum {self.get('zeraki_num')}")
-                    pass
-            elif header == 'GR':
-                try:
-                    self.grades[0]['str'] = str(row[idx])
-                    print(f"Student {self.zeraki_name} has an overall grade of {str(row[idx])}.")
-                except ValueError:
-                    print(f"string grade expected for GR")
-                    pass
-                except (IndexError,KeyError):
-                    print(f"corrupt grades property in import record for znum {self.get('zeraki_num')}")
-                    pass
-            elif header in ['ENG','KIS','MAT','BIO','PHY','CHE','HIS','GEO','CRE','IRE','BST']:
-                self.add_grade(header,str(row[idx]))
+        self.grade_nums = [None]*len(self.GRADE_SUBJECTS)
+        self.grade_strs = [None]*len(self.GRADE_SUBJECTS)
+        if header_plan is None:
+            header_plan = HeaderPlan(headers)
+        # without parse_grades the subject columns are left for parse_grade_columns
+        columns = header_plan.columns if parse_grades else header_plan.row_columns
+        for idx,header,parser in columns:
+            parser(self,header,row[idx])
+
+    def parse_zeraki_num(self,header:str,value:str):
+        self.zeraki_num = int(value)
+
+    def parse_zeraki_name(self,header:str,value:str):
+        self.zeraki_name = value.upper().strip()
+        self.parse_names()
+
+    def parse_kcpe(self,header:str,value:str):
+        try:
+            self.kcpe = int(value)
+        except ValueError:
+            pass
+
+    def parse_total_points(self,header:str,value:str):
+        try:
+            self.grade_nums[0] = float(value)
+            log.debug(f"Student {self.zeraki_name} has an overall numeric grade of {float(value)}.")
+        except ValueError:
+            log.warning(f"CSV row {self.csv_row}: numeric grade expected for TT PTS")
+            pass
+        except (IndexError,KeyError):
+            log.warning(f"corrupt grades property in import record for znum {self.get('zeraki_num')}")
+            pass
 
-    def match_to_at_student(self,students:List[RecordDict],verbose:bool=False):
+    def parse_overall_grade(self,header:str,value:str):
+        try:
+            self.grade_strs[0] = str(value)
+            log.debug(f"Student {self.zeraki_name} has an overall grade of {str(value)}.")
+        except ValueError:
+            log.warning(f"CSV row {self.csv_row}: string grade expected for GR")
+            pass
+        except (IndexError,KeyError):
+            log.warning(f"corrupt grades property in import record for znum {self.get('zeraki_num')}")
+            pass
+
+    def parse_subject_grade(self,header:str,value:str):
+        self.add_grade(header,str(value))
+
+    def match_to_at_student(self,students:'StudentIndex',verbose:bool=False):
         # MATCH BY ZERAKI NUM
         # if student not already matched
         if self.get('at_id') == None:
             self.match_type = 'no match'
-            
-            # search airtable data for matching zeraki num, grad class, name
-            for student in students:
+            if not isinstance(students,StudentIndex):
+                students = StudentIndex(students)
+
+            # look up airtable data for matching zeraki num
+            student = students.by_znum.get(self.get('zeraki_num'))
+            if student is not None:
+                self.at_id = student['fields']['ID']
+                self.at_rec_id = student['id']
+                self.match_type = 'adm no'
+                self.matched_record = student
                 try:
-                    at_znum = int(student['fields']['Zeraki ADM No'])
-                except (KeyError, ValueError):
-                    # no zeraki num or invalid num in db so continue to next student
-                    continue
-                
-                if self.get("zeraki_num") == at_znum:
-                    self.at_id = student['fields']['ID']
-                    self.at_rec_id = student['id']
-                    self.match_type = 'adm no'
-                    self.matched_record = student
-                    try:
-                        self.grad_year = student['fields']['Grad Class']
-                    except KeyError:
-                        pass
-
-                    #check for exact match
-                    db_first_name = student['fields']['First name']
-                    db_last_name = student['fields']['Last name']
-                    db_first_name = db_first_name.upper().strip()
-                    db_last_name = db_last_name.upper().strip()
-                    if self.name('first') == db_first_name and self.name('last') == db_last_name:
-                        self.match_type = 'exact'
-                        if verbose:
-                            print(f"Found exact match by Zeraki Num {self.zeraki_num} and Name for Student ID {self.at_id} - {self.name()}.")
-                            print("")
-                        return self.at_id
-                    else:
-                        if verbose:
-                            print(f"Found match by Zeraki Num {self.zeraki_num} to Student ID {self.at_id} - {db_first_name} {db_last_name}.")
-                            print("")   
-                        return True
+                    self.grad_year = student['fields']['Grad Class']
+                except KeyError:
+                    pass
+
+                #check for exact match
+                db_first_name, db_last_name = students.names[students.position[student['id']]]
+                if self.name('first') == db_first_name and self.name('last') == db_last_name:
+                    self.match_type = 'exact'
+                    if verbose:
+                        print(f"Found exact match by Zeraki Num {self.zeraki_num} and Name for Student ID {self.at_id} - {self.name()}.")
+                        print("")
+                    return self.at_id
+                else:
+                    if verbose:
+                        print(f"Found match by Zeraki Num {self.zeraki_num} to Student ID {self.at_id} - {db_first_name} {db_last_name}.")
+                        print("")   
+                    return True
             if verbose:
                 print(f"No matches found by Zeraki Number {self.zeraki_num} - {self.name()}.")
                 print("")
@@ -109,35 +169,54 @@ class ImportRecord:
 
     def add_grade(self,subj:str,csv_grade:str):
         if (subj not in ('TT PTS','GR')) and csv_grade != "":
-            grade_num = None
-            grade_str = None
-            grade_vals = csv_grade.split(" ")
-            for grade in grade_vals:
-                try:
-                    grade_num = int(grade)
-                except:
-                    grade_str = grade
+            grade_num, grade_str = split_grade_cell(csv_grade)
             if grade_num is None and grade_str is None:
-                print(f"CSV row {self.csv_row} student {self.zeraki_name} has null grades for {subj}. Skipping...")
-            elif grade_num == None:
-                self.grades.append({
-                    'subj':subj,
-                    'str':grade_str
-                        })
-                print(f"CSV row {self.csv_row} student {self.zeraki_name} has a {grade_str} grade for {subj}.")
-            elif grade_str == None:
-                self.grades.append({
-                    'subj':subj,
-                    'num':grade_num
-                        })
-                print(f"CSV row {self.csv_row} student {self.zeraki_name} has a {grade_num} grade for {subj}.")
-            else:
-                self.grades.append({
-                                    'subj':subj,
-                                    'str':grade_str,
-                                    'num':grade_num
-                                    })
-                print(f"CSV row {self.csv_row} student {self.zeraki_name} has a {grade_str} grade with {grade_num} pts for {subj}.")
+                log.debug(f"CSV row {self.csv_row} student {self.zeraki_name} has null grades for {subj}. Skipping...")
+                return
+            try:
+                idx = self.GRADE_INDEX[subj]
+            except KeyError:
+                raise ValueError(f"{subj} is not a Zeraki subject")
+            self.grade_nums[idx] = grade_num
+            self.grade_strs[idx] = grade_str
+            self.log_grade(subj)
+
+    def log_grade(self,subj:str):
+        idx = self.GRADE_INDEX[subj]
+        grade_num = self.grade_nums[idx]
+        grade_str = self.grade_strs[idx]
+        if grade_num is None and grade_str is None:
+            return
+        if grade_num == None:
+            log.debug(f"CSV row {self.csv_row} student {self.zeraki_name} has a {grade_str} grade for {subj}.")
+        elif grade_str == None:
+            log.debug(f"CSV row {self.csv_row} student {self.zeraki_name} has a {grade_num} grade for {subj}.")
+        else:
+            log.debug(f"CSV row {self.csv_row} student {self.zeraki_name} has a {grade_str} grade with {grade_num} pts for {subj}.")
+
+    @property
+    def grades(self) -> List[dict]:
+        """Grades as a list of {'subj','str','num'} dicts, the overall grade first.
+
+        Subject grades only have the 'str'/'num' keys they have values for.
+        """
+        grades = [{'subj':'Overall', 'str': self.grade_strs[0], 'num': self.grade_nums[0]}]
+        for idx in range(1,len(self.GRADE_SUBJECTS)):
+            grade_num = self.grade_nums[idx]
+            grade_str = self.grade_strs[idx]
+            if grade_num is None and grade_str is None:
+                continue
+            grade = {'subj': self.GRADE_SUBJECTS[idx]}
+            if grade_str is not None:
+                grade['str'] = grade_str
+            if grade_num is not None:
+                grade['num'] = grade_num
+            grades.append(grade)
+        return grades
+
+    def grade_count(self) -> int:
+        """Number of subjects with a grade, not counting the overall grade"""
+        return sum(1 for idx in range(1,len(self.GRADE_SUBJECTS)) if self.grade_nums[idx] is not None or self.grade_strs[idx] is not None)
 
     def add_test_type(self,test_type:str,form:str,test_date_str:str,grad_year:str):
         self.test_type = test_type #user input should have already validated test type matches Airtable vals
@@ -199,7 +278,7 @@ class ImportRecord:
             pass
         try:
             text = text + f"""
-    {self.test_date} - {self.form} {self.test_type} test results for {len(self.grades) - 1} subjects """
+    {self.test_date} - {self.form} {self.test_type} test results for {self.grade_count()} subjects """
         except:
             pass
         return text
@@ -208,11 +287,11 @@ class ImportRecord:
         try:
             names = self.get('zeraki_name').upper().split(' ')
         except TypeError:
-            print(f"Row {self.get('csv_row')}: Error splitting Student Name, no Zeraki Name present, skipping student.")
+            log.warning(f"Row {self.get('csv_row')}: Error splitting Student Name, no Zeraki Name present, skipping student.")
             return
         name_count = len(names)
         if name_count < 2:
-            print(f"Row {self.get('csv_row')}: Error splitting Student Name, unexpected number of names: {self.get('zeraki_name')}.")
+            log.warning(f"Row {self.get('csv_row')}: Error splitting Student Name, unexpected number of names: {self.get('zeraki_name')}.")
         else:
             self.first_name = names[0].strip().upper()
             self.last_name = " ".join(names[1:]).strip().upper()
@@ -258,6 +337,110 @@ class ImportRecord:
             import_dict['KCPE Score'] = self.get('kcpe')
         return import_dict
 
+class HeaderPlan:
+    """Which ImportRecord parser handles each column of a Zeraki CSV, worked out once from
+    the header row so each row is parsed without re-checking every header.
+    """
+    SUBJECTS = ZERAKI_SUBJECTS
+    EXPECTED_HEADERS = ('ADMNO','NAME')
+
+    def __init__(self,headers:List[str]):
+        parsers = {
+            'ADMNO': ImportRecord.parse_zeraki_num,
+            'NAME': ImportRecord.parse_zeraki_name,
+            'KCPE': ImportRecord.parse_kcpe,
+            'TT PTS': ImportRecord.parse_total_points,
+            'GR': ImportRecord.parse_overall_grade,
+        }
+        for subj in self.SUBJECTS:
+            parsers[subj] = ImportRecord.parse_subject_grade
+
+        self.columns = []
+        self.ignored = []
+        for idx,header in enumerate(headers):
+            if header in parsers:
+                self.columns.append((idx,header,parsers[header]))
+            elif header != '':
+                self.ignored.append(header)
+        self.row_columns = [column for column in self.columns if column[1] not in self.SUBJECTS]
+        self.subject_columns = [(idx,header) for idx,header,_ in self.columns if header in self.SUBJECTS]
+        self.missing = [header for header in self.EXPECTED_HEADERS if header not in headers]
+        self.subjects = [header for header in headers if header in self.SUBJECTS]
+
+    def report(self):
+        if self.missing:
+            log.warning(f"CSV is missing expected column(s): {', '.join(self.missing)}")
+        log.info(f"Importing subjects: {', '.join(self.subjects) if self.subjects else 'none'}")
+        if self.ignored:
+            log.info(f"Ignoring column(s): {', '.join(self.ignored)}")
+
+class StudentIndex:
+    """Airtable student records indexed by Zeraki number and name, built once per import
+    so matching each CSV row is a dictionary lookup rather than a scan of every student.
+
+    Names are stored upper case and stripped, the same way ImportRecord stores them.
+    Index values are positions in the original student list, so candidate lists keep
+    the order the records were fetched in.
+    """
+    def __init__(self,students:List[RecordDict]):
+        self.students = students
+        self.position = {}
+        self.names = []
+        self.labels = []
+        self.by_znum = {}
+        self.by_full_name = {}
+        self.by_first_name = {}
+        self.by_last_name = {}
+        self.by_name_token = {}
+        for pos,student in enumerate(students):
+            fields = student['fields']
+            self.position[student['id']] = pos
+            try:
+                # first student with a zeraki num wins, matching the old linear scan
+                self.by_znum.setdefault(int(fields['Zeraki ADM No']),student)
+            except (KeyError, ValueError, TypeError):
+                # no zeraki num or invalid num in db
+                pass
+            db_first_name = str(fields.get('First name','')).upper().strip()
+            db_last_name = str(fields.get('Last name','')).upper().strip()
+            self.names.append((db_first_name,db_last_name))
+            self.labels.append(f"Student ID: {fields.get('ID')}: First name: {db_first_name} Last name: {db_last_name}")
+            self.by_full_name.setdefault((db_first_name,db_last_name),student)
+            self.by_first_name.setdefault(db_first_name,[]).append(pos)
+            self.by_last_name.setdefault(db_last_name,[]).append(pos)
+            for token in set(db_first_name.split(' ')+db_last_name.split(' ')):
+                if token != '':
+                    self.by_name_token.setdefault(token,[]).append(pos)
+
+    def __len__(self) -> int:
+        return len(self.students)
+
+    def name_candidates(self,record:ImportRecord) -> List[Tuple[str,List[int]]]:
+        """Group the students that could match a record by how their names overlap.
+
+        Each student is placed in the first group it qualifies for, in the order
+        'last name', 'first name', 'common name', 'no match'.
+
+        Returns:
+            List[Tuple[str,List[int]]]: (match type, student positions) for each group
+        """
+        last_matches = list(self.by_last_name.get(record.name('last'),[]))
+        seen = set(last_matches)
+        first_matches = [pos for pos in self.by_first_name.get(record.name('first'),[]) if pos not in seen]
+        seen.update(first_matches)
+        common_matches = set()
+        for token in record.name().split(' '):
+            common_matches.update(pos for pos in self.by_name_token.get(token,[]) if pos not in seen)
+        common_matches = sorted(common_matches)
+        seen.update(common_matches)
+        no_matches = [pos for pos in range(len(self.students)) if pos not in seen]
+        return [
+            ('last name',last_matches),
+            ('first name',first_matches),
+            ('common name',common_matches),
+            ('no match',no_matches),
+        ]
+
 # User Input Functions
 def user_selection(options_list:List[str],quit_allowed:bool=True) -> str:
     for idx, option in enumerate(options_list,start=1):
@@ -329,7 +512,13 @@ def select_file() -> Optional[TextIO]:
 def print_dict(d:dict):
     print(json.dumps(d, indent=4))
 
-def compare_records(csv_data:dict,db_data:dict):
+def compare_records(csv_data:dict,db_data:dict,prompting:bool=True):
+    """Show the differences between import data and an existing record.
+
+    The differences are printed when the user is about to be asked to approve them
+    (so they show even with -q), and only logged otherwise.
+    """
+    show = print if prompting else log.info
     keys_to_update = []
     comparison_text = "Proposed updates to the DB:"
     for key,csv_val in csv_data.items():
@@ -369,9 +558,9 @@ def compare_records(csv_data:dict,db_data:dict):
                 keys_to_update.append(key)
     
     if len(keys_to_update) > 0:
-        print(comparison_text + "\n")
+        show(comparison_text + "\n")
     else:
-        print("No differences between import data and existing record.\n")
+        show("No differences between import data and existing record.\n")
 
     return keys_to_update
 
@@ -433,11 +622,130 @@ def parse_csv(file:TextIO) -> Optional[List[List[str]]]:
 
 def csv_to_import_records(file:TextIO):
     data,headers = parse_csv(file)
+    return rows_to_import_records(headers,data)
+
+def rows_to_import_records(headers:List[str],rows) -> List[ImportRecord]:
+    # check the headers once for the whole file
+    header_plan = HeaderPlan(headers)
+    header_plan.report()
+    rows = list(rows)
     import_list = []
-    for rownum,row in enumerate(data,1):
-        import_list.append(ImportRecord(row,headers,rownum))
+    for rownum,row in enumerate(rows,1):
+        import_list.append(ImportRecord(row,headers,rownum,header_plan,parse_grades=False))
+    parse_grade_columns(import_list,rows,header_plan)
     return import_list
 
+def parse_grade_columns(import_list:List[ImportRecord],rows:List[List[str]],header_plan:HeaderPlan):
+    """Parse the subject grades of a whole file a column at a time into its ImportRecords,
+    reporting every malformed cell in one table.
+    """
+    malformed = []
+    for col_idx, subj in header_plan.subject_columns:
+        cells = [row[col_idx] for row in rows]
+        nums, strs, bad_cells = parse_grade_column(cells)
+        grade_idx = ImportRecord.GRADE_INDEX[subj]
+        for rec, grade_num, grade_str in zip(import_list,nums,strs):
+            rec.grade_nums[grade_idx] = grade_num
+            rec.grade_strs[grade_idx] = grade_str
+        malformed.extend((import_list[pos].csv_row,subj,cells[pos],nums[pos],strs[pos]) for pos in bad_cells)
+
+    if debug_enabled():
+        for rec in import_list:
+            for _, subj in header_plan.subject_columns:
+                rec.log_grade(subj)
+    if malformed:
+        malformed.sort()
+        lines = [f"    CSV row {csv_row:<4} {subj:<4} {cell!r:<12} read as {grade_num} {grade_str!r}" for csv_row, subj, cell, grade_num, grade_str in malformed]
+        log.warning(f"{len(malformed)} grade cell(s) are not in the usual \"64 C+\" form:\n" + "\n".join(lines),
+                    extra={'data': [{'csv_row': csv_row, 'subject': subj, 'cell': cell, 'num': grade_num, 'str': grade_str} for csv_row, subj, cell, grade_num, grade_str in malformed]})
+
+def xlsx_rows(xlsx_file:str,include_title:bool=False):
+    """Yield the rows of the active sheet of a Zeraki XLSX file as lists of strings,
+    as they would read back from a CSV, skipping the title row above the headers
+    unless include_title is set.
+    """
+    wb = openpyxl.load_workbook(
+        xlsx_file,
+        read_only=True,
+        data_only=True
+    )
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        # Skip the first row (title)
+        if not include_title:
+            next(rows, None)
+        for row in rows:
+            yield ["" if value is None else str(value) for value in row]
+    finally:
+        wb.close()
+
+def xlsx_to_import_records(xlsx_file:str,csv_file:Optional[str]=None) -> List[ImportRecord]:
+    """Read ImportRecords straight from an XLSX file, in one pass over the workbook.
+
+    Args:
+        xlsx_file (str): Zeraki XLSX file
+        csv_file (str): if given, also write the sheet to this CSV to keep with the imported files
+
+    Returns:
+        List[ImportRecord]: one per row after the headers
+    """
+    rows = xlsx_rows(xlsx_file)
+    if csv_file is None:
+        headers = next(rows)
+        return rows_to_import_records(headers,rows)
+
+    with open(csv_file, 'w', newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        def archived(rows):
+            for row in rows:
+                writer.writerow(row)
+                yield row
+        rows = archived(rows)
+        headers = next(rows)
+        import_list = rows_to_import_records(headers,rows)
+    log.info(f"Successfully converted '{xlsx_file}' to '{csv_file}'")
+    return import_list
+
+def read_import_file(file_path:str,csv_path:Optional[str]=None) -> List[ImportRecord]:
+    "Parse a CSV or XLSX import file, writing an XLSX file's sheet to csv_path too if given"
+    if file_path.lower().endswith('.xlsx'):
+        return xlsx_to_import_records(file_path,csv_path)
+    with open(file_path,mode="r",newline='') as file:
+        return csv_to_import_records(file)
+
+def read_import_files(file_paths:List[str],max_workers:Optional[int]=None,csv_paths:Optional[List[Optional[str]]]=None) -> List[Tuple[str,Optional[List[ImportRecord]],Optional[str]]]:
+    """Parse many CSV or XLSX files into ImportRecords, spread across processes.
+
+    Args:
+        file_paths (List[str]): CSV or XLSX files to parse
+        max_workers (int): processes to use, defaults to one per CPU
+        csv_paths (List[Optional[str]]): for each file, where to write an XLSX file's sheet as CSV
+
+    Returns:
+        List[Tuple[str,Optional[List[ImportRecord]],Optional[str]]]: (file path, records, error) in the
+            order of file_paths, with records None and the error message set for files that couldn't be parsed
+    """
+    results = []
+    if csv_paths is None:
+        csv_paths = [None]*len(file_paths)
+    if len(file_paths) <= 1:
+        # not worth starting processes for a single file
+        for file_path, csv_path in zip(file_paths,csv_paths):
+            try:
+                results.append((file_path,read_import_file(file_path,csv_path),None))
+            except Exception as e:
+                results.append((file_path,None,f"{type(e).__name__}: {e}"))
+        return results
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(read_import_file,file_path,csv_path) for file_path, csv_path in zip(file_paths,csv_paths)]
+        for file_path, future in zip(file_paths,futures):
+            try:
+                results.append((file_path,future.result(),None))
+            except Exception as e:
+                results.append((file_path,None,f"{type(e).__name__}: {e}"))
+    return results
+
 # Airtable functions
 def initialize_airtable() -> Base:
     """Find access key in current directory, connect to airtable, 
@@ -458,7 +766,11 @@ def initialize_airtable() -> Base:
         access_key = file.read()
     access_key = str(access_key)
     access_key = access_key.strip()
-    api = Api(access_key)
+
+    # pyairtable's own retries are replaced by the shared throttle, which also keeps to the per-base rate limit
+    api = Api(access_key,retry_strategy=False)
+    api.session = airtable_client.ThrottledSession(airtable_client.throttle_for(base_id))
+    api.api_key = access_key
     b = api.base(base_id)
     return b
 
@@ -476,10 +788,305 @@ def get_field_from_table(table_schema,field_id):
     else:
         return matched_fields[0]
 
+class SchemaCache:
+    """Base schema fetched once per run, with field lookups by table and field name or ID.
+
+    If a cache_path is given the schema is also saved to disk and reused by later runs
+    until it is older than ttl seconds. Delete the file to pick up schema changes sooner.
+    """
+    DEFAULT_TTL = 24*60*60
+
+    def __init__(self,base:Base,cache_path:Optional[str]=None,ttl:int=DEFAULT_TTL):
+        self.base = base
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.base_schema = None
+        self.tables = {}
+        self.fields = {}
+
+    def load(self) -> BaseSchema:
+        if self.base_schema is not None:
+            return self.base_schema
+        data = self.read_from_disk()
+        if data is None:
+            data = self.base.api.get(self.base.meta_url('tables'))
+            self.write_to_disk(data)
+        self.base_schema = BaseSchema.from_api(data,self.base.api,context=self.base)
+
+        # index tables and fields by both name and ID
+        for table_schema in self.base_schema.tables:
+            self.tables[table_schema.name] = table_schema
+            self.tables[table_schema.id] = table_schema
+            for field in table_schema.fields:
+                self.fields[(table_schema.id,field.name)] = field
+                self.fields[(table_schema.id,field.id)] = field
+        return self.base_schema
+
+    def read_from_disk(self) -> Optional[dict]:
+        if self.cache_path is None or not os.path.isfile(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path,'r',encoding='UTF-8') as file:
+                cached = json.load(file)
+        except (OSError,ValueError):
+            return None
+        if cached.get('base_id') != self.base.id or time.time() - cached.get('fetched_at',0) > self.ttl:
+            return None
+        return cached.get('schema')
+
+    def write_to_disk(self,data:dict):
+        if self.cache_path is None:
+            return
+        try:
+            with open(self.cache_path,'w',encoding='UTF-8') as file:
+                json.dump({'base_id': self.base.id, 'fetched_at': time.time(), 'schema': data},file)
+        except OSError as e:
+            log.warning(f"Unable to save schema cache to {self.cache_path}: {e}")
+
+    def table(self,table_name_or_id:str) -> TableSchema:
+        self.load()
+        try:
+            return self.tables[table_name_or_id]
+        except KeyError:
+            raise ValueError(f'No table by the name or id of {table_name_or_id}')
+
+    def field(self,table_name_or_id:str,field_name_or_id:str) -> FieldSchema:
+        table_schema = self.table(table_name_or_id)
+        try:
+            return self.fields[(table_schema.id,field_name_or_id)]
+        except KeyError:
+            raise ValueError(f'No field by the name or id of {field_name_or_id} in table {table_schema.name}')
+
+    def field_type(self,table_name_or_id:str,field_name_or_id:str) -> str:
+        return self.field(table_name_or_id,field_name_or_id).type
+
+    def field_options(self,table_name_or_id:str,field_name_or_id:str) -> List[str]:
+        return get_field_options(self.field(table_name_or_id,field_name_or_id))
+
+class RecordCache:
+    """Read-through cache of Airtable record fetches in a local SQLite file.
+
+    Each fetch is stored by table and query options, and reused by later runs until it
+    is older than ttl seconds. Call invalidate after writing to a table so the next run
+    fetches it again.
+    """
+    DEFAULT_TTL = 60*60
+
+    def __init__(self,cache_path:str,ttl:int=DEFAULT_TTL):
+        self.ttl = ttl
+        self.conn = sqlite3.connect(cache_path)
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS fetches (
+                table_key TEXT, query TEXT, fetched_at REAL, records TEXT,
+                PRIMARY KEY (table_key, query))""")
+
+    def table_key(self,table:Table) -> str:
+        return f"{table.base.id}/{table.name}"
+
+    def all(self,table:Table,**options) -> List[RecordDict]:
+        query = json.dumps(options,sort_keys=True,default=str)
+        row = self.conn.execute(
+            "SELECT fetched_at, records FROM fetches WHERE table_key = ? AND query = ?",
+            (self.table_key(table),query)).fetchone()
+        if row is not None and time.time() - row[0] <= self.ttl:
+            log.info(f"Using {table.name} records cached {int((time.time() - row[0])/60)} minute(s) ago.")
+            return json.loads(row[1])
+        records = table.all(**options)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO fetches (table_key, query, fetched_at, records) VALUES (?, ?, ?, ?)",
+                (self.table_key(table),query,time.time(),json.dumps(records)))
+        return records
+
+    def invalidate(self,table:Table):
+        with self.conn:
+            self.conn.execute("DELETE FROM fetches WHERE table_key = ?",(self.table_key(table),))
+
+def fetch_records(table:Table,record_cache:Optional[RecordCache]=None,**options) -> List[RecordDict]:
+    if record_cache is not None:
+        return record_cache.all(table,**options)
+    return table.all(**options)
+
+def file_hash(file_path:str) -> str:
+    "SHA-256 of a file's contents, so a file is recognised even after it is renamed"
+    digest = hashlib.sha256()
+    with open(file_path,'rb') as file:
+        for chunk in iter(lambda: file.read(1024*1024),b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ImportJournal:
+    """Outcome of each row imported from a file, kept in a local SQLite file as it happens.
+
+    Outcomes are keyed by a hash of the file's contents and what it is being imported as
+    (e.g. the test type, form and date of its grades), so rerunning a file after quitting
+    or a crash skips the rows already done. Students are journalled once per row and
+    grades once per subject. Writes that failed are not journalled, so they are retried.
+    Once every row of the file has been gone through with no failed writes its outcomes
+    are dropped, so only interrupted or partly failed imports are resumed.
+    """
+    def __init__(self,journal_path:str,file_path:str,import_key:str,restart_before:Optional[float]=None):
+        """Open the journal for a file being imported.
+
+        restart_before is when the file was last recorded as imported (see ImportManifest.imported_time):
+        outcomes from before then belong to that finished import and are dropped, so importing the
+        file again imports every row, while an interrupted re-import still resumes.
+        """
+        self.conn = sqlite3.connect(journal_path)
+        self.file_hash = file_hash(file_path)
+        self.import_key = import_key
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS outcomes (
+                file_hash TEXT, import_key TEXT, csv_row INTEGER, item TEXT, outcome TEXT,
+                record_id TEXT, fields TEXT, recorded_at REAL,
+                PRIMARY KEY (file_hash, import_key, csv_row, item))""")
+        if restart_before is not None:
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM outcomes WHERE file_hash = ? AND import_key = ? AND recorded_at < ?",
+                    (self.file_hash,self.import_key,restart_before))
+        rows = self.conn.execute(
+            "SELECT csv_row, item, outcome FROM outcomes WHERE file_hash = ? AND import_key = ?",
+            (self.file_hash,self.import_key)).fetchall()
+        self.outcomes = {(csv_row,item): outcome for csv_row, item, outcome in rows}
+        self.skipped = 0
+        if self.outcomes:
+            log.info(f"Resuming an earlier import of {os.path.basename(file_path)}: {len(self.outcomes)} row outcome(s) already journalled will be skipped.")
+
+    def done(self,csv_row:int,item:str='') -> bool:
+        if (csv_row,item) in self.outcomes:
+            self.skipped += 1
+            return True
+        return False
+
+    def record(self,csv_row:int,outcome:str,item:str='',record_id:Optional[str]=None,fields:Optional[dict]=None):
+        """Save a row's outcome.
+
+        Args:
+            csv_row (int): row of the import file
+            outcome (str): created, updated, upserted, unchanged or skipped
+            item (str): the grade's subject, or '' for a whole row
+            record_id (str): Airtable ID of the record written
+            fields (dict): fields written to Airtable
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO outcomes (file_hash, import_key, csv_row, item, outcome, record_id, fields, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.file_hash,self.import_key,csv_row,item,outcome,record_id,json.dumps(fields,default=str) if fields is not None else None,time.time()))
+        self.outcomes[(csv_row,item)] = outcome
+
+    def print_skipped(self,label:str):
+        if self.skipped > 0:
+            print(f"{self.skipped} {label} already imported in an earlier run were skipped.")
+
+    def clear(self):
+        "Drop the outcomes of this file, so the next run of it imports every row"
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM outcomes WHERE file_hash = ? AND import_key = ?",
+                (self.file_hash,self.import_key))
+        self.outcomes = {}
+
+    def finish(self,label:str,completed:bool=True):
+        """Mark the file's import complete if every row was gone through with no failed writes,
+        otherwise keep the outcomes so a rerun only retries the rows not done."""
+        self.print_skipped(label)
+        if completed:
+            self.clear()
+        elif self.outcomes:
+            print(f"The import journal for this file is kept, so running it again only imports the {label} not done yet.")
+
+# Record of the files already imported, and where they are moved to afterwards
+IMPORT_MANIFEST_PATH = '.import-manifest.json'
+ARCHIVE_FOLDER = './imported'
+
+class ImportManifest:
+    """Files already imported, keyed by a hash of their contents and what they were imported as.
+
+    Each entry keeps the name of the file, the grad class, test type, date and form
+    parsed from it, when it was imported and the counts of what was imported, so a
+    file dropped into to-import again (even renamed) is recognised.
+    """
+    def __init__(self,manifest_path:str=IMPORT_MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        try:
+            with open(manifest_path,'r',encoding='UTF-8') as file:
+                self.entries = json.load(file).get('files',{})
+        except (OSError,ValueError):
+            self.entries = {}
+
+    def find(self,file_path:str,import_type:str) -> Optional[dict]:
+        return self.entries.get(f"{import_type}/{file_hash(file_path)}")
+
+    def find_exam(self,file_path:str,details:Tuple[str],import_type:str) -> List[dict]:
+        "Entries for other files imported with the same (grad_year, test_type, test_date, form)"
+        own_key = f"{import_type}/{file_hash(file_path)}"
+        return [
+            entry for key, entry in self.entries.items()
+            if key.startswith(f"{import_type}/") and key != own_key and tuple(entry.get('details') or ()) == tuple(details)
+        ]
+
+    def imported_time(self,file_path:str,import_type:str) -> Optional[float]:
+        "When the file was last recorded as imported, as a timestamp, or None if it wasn't"
+        entry = self.find(file_path,import_type)
+        if entry is None:
+            return None
+        if 'imported_time' in entry:
+            return entry['imported_time']
+        # entries without it were recorded to the second, so count the whole of that second
+        return datetime.fromisoformat(entry['imported_at']).timestamp() + 1
+
+    def record(self,file_path:str,import_type:str,details:Optional[Tuple[str]]=None,counts:Optional[Tuple[int]]=None):
+        self.entries[f"{import_type}/{file_hash(file_path)}"] = {
+            'file_name': os.path.basename(file_path),
+            'import_type': import_type,
+            'details': list(details) if details is not None else None,
+            'counts': list(counts) if counts is not None else None,
+            'imported_at': datetime.now().isoformat(timespec='seconds'),
+            'imported_time': time.time(),
+        }
+        try:
+            with open(self.manifest_path,'w',encoding='UTF-8') as file:
+                json.dump({'files': self.entries},file,indent=4,sort_keys=True)
+        except OSError as e:
+            log.warning(f"Unable to save import manifest to {self.manifest_path}: {e}")
+
+def already_imported_message(entry:dict) -> str:
+    return f"already imported on {entry['imported_at']} from {entry['file_name']}"
+
+def archive_import_file(file_path:str,archive_folder:str=ARCHIVE_FOLDER) -> Optional[str]:
+    """Move an imported file into the archive folder, keeping any file already there with the same name.
+
+    Returns:
+        str: where the file was moved to, or None if it couldn't be moved
+    """
+    if not os.path.isfile(file_path):
+        return None
+    os.makedirs(archive_folder,exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(file_path))
+    target = os.path.join(archive_folder,f"{stem}{ext}")
+    copy_num = 1
+    while os.path.exists(target):
+        if file_hash(target) == file_hash(file_path):
+            # the same file is already archived
+            os.remove(file_path)
+            return target
+        copy_num += 1
+        target = os.path.join(archive_folder,f"{stem} ({copy_num}){ext}")
+    try:
+        shutil.move(file_path,target)
+    except OSError as e:
+        log.warning(f"Unable to move {file_path} to {archive_folder}: {e}")
+        return None
+    log.info(f"Moved {file_path} to {target}")
+    return target
+
 # Student functions
-def get_students_from_grad_year(fields:List[str],students_table:Table,grad_year:str) -> Optional[Tuple[List[RecordDict],str]]:
-    grad_yr_field = students_table.schema().field('Grad Class')
-    grad_yr_options = get_field_options(grad_yr_field)
+def get_students_from_grad_year(fields:List[str],students_table:Table,grad_year:str,schema_cache:Optional[SchemaCache]=None,record_cache:Optional[RecordCache]=None) -> Optional[Tuple[List[RecordDict],str]]:
+    if schema_cache is not None:
+        grad_yr_options = schema_cache.field_options(students_table.name,'Grad Class')
+    else:
+        grad_yr_options = get_field_options(students_table.schema().field('Grad Class'))
     if grad_year not in grad_yr_options:
         print('Please select the graduating class year for the students you are importing:')
         selected_grad_yr = user_selection(grad_yr_options) # Could Raise UserQuitOut
@@ -487,7 +1094,7 @@ def get_students_from_grad_year(fields:List[str],students_table:Table,grad_year:
         selected_grad_yr = grad_year
 
     formula = formulas.match({'Grad Class': selected_grad_yr})
-    records = students_table.all(fields=fields, formula=formula)
+    records = fetch_records(students_table,record_cache,fields=fields,formula=formula)
     return (records, selected_grad_yr)
 
 def get_next_at_student_id(grad_year:str,students:List[RecordDict]) -> int:
@@ -500,49 +1107,27 @@ def get_next_at_student_id(grad_year:str,students:List[RecordDict]) -> int:
         next_id = (int(grad_year)-2000)*100
     return next_id
 
-def find_match_by_name(record:ImportRecord, students:List[RecordDict]) -> ImportRecord:
-    match_outcome_list = []
-    for student in students:
-        match_type = 'no match'
-        db_first_name = student['fields']['First name'].upper().strip()
-        db_last_name = student['fields']['Last name'].upper().strip()
-
-        # Automatically match and return full name matches
-        if record.name('first') == db_first_name and record.name('last') == db_last_name:
-            match_type = 'full name'
-            record.matched_record = student
-            record.at_id = record.matched_record['fields']['ID']
-            record.match_type = match_type
-            try:
-                record.grad_year = student['fields']['Grad Class']
-            except KeyError:
-                pass
-            print(f"Found {record.get('match_type')} match for Student ID {record.at_id} - {record.name()}")
-            print("")
-            return record
+def find_match_by_name(record:ImportRecord, students:StudentIndex) -> ImportRecord:
+    if not isinstance(students,StudentIndex):
+        students = StudentIndex(students)
 
-        #set other match types
-        elif record.name('last') == db_last_name:
-            match_type = 'last name'
-        elif record.name('first') == db_first_name:
-            match_type = 'first name'
-        else:
-            # check if any of their names match, regardless of order
-            db_name_list = db_first_name.split(' ')+db_last_name.split(' ')
-            csv_name_list = record.name().split(' ')
-            common_names = [item for item in db_name_list if item in csv_name_list]
-            if len(common_names)> 0:
-                match_type = 'common name'
-        
-        # add each potential match (besides full name matches) to a selection list
+    # Automatically match and return full name matches
+    student = students.by_full_name.get((record.name('first'),record.name('last')))
+    if student is not None:
+        record.matched_record = student
+        record.at_id = record.matched_record['fields']['ID']
+        record.match_type = 'full name'
         try:
-            match_outcome_list.append((student,match_type,f"Student ID: {student['fields']['ID']}: First name: {db_first_name} Last name: {db_last_name}"))
-        except UnboundLocalError: #if match_type isn't set, it's not a match so skip to the next student
-           continue
-        
+            record.grad_year = student['fields']['Grad Class']
+        except KeyError:
+            pass
+        # printed as the update prompts that follow are about this student
+        print(f"Found {record.get('match_type')} match for Student ID {record.at_id} - {record.name()}\n")
+        return record
+
     # loop through match types in order of likely accuracy
-    for match_type in ['last name','first name','common name','no match']:
-        match_options = [m[2] for m in match_outcome_list if m[1] == match_type]
+    for match_type, positions in students.name_candidates(record):
+        match_options = [students.labels[pos] for pos in positions]
         match_options.append('None of these are a match')
 
         # print to user why the listed students are possible matches
@@ -556,27 +1141,33 @@ def find_match_by_name(record:ImportRecord, students:List[RecordDict]) -> Import
             selected_record_text = user_selection(match_options,quit_allowed=True) #could raise UserQuitOut
 
             #handle user selection
-            selected_record_list = [m for m in match_outcome_list if selected_record_text == m[2]]
+            selected_record_list = [pos for pos in positions if selected_record_text == students.labels[pos]]
             if len(selected_record_list) > 1:
                 raise DuplicateRecordError
             elif len(selected_record_list) == 1:
-                record.matched_record = selected_record_list[0][0]
+                record.matched_record = students.students[selected_record_list[0]]
                 record.at_id = record.matched_record['fields']['ID']
                 record.match_type = match_type
                 try:
-                    record.grad_year = student['fields']['Grad Class']
+                    record.grad_year = record.matched_record['fields']['Grad Class']
                 except KeyError:
                     pass
                 #print(f"Match found by {match_type} for student {str(record)}")
                 return record
-    print(f"No matches found by name for student {record.name()}.")
-    print("")
+    log.info(f"No matches found by name for student {record.name()}.\n")
     return record
 
-def convert_numeric_values(table:Table,fields_to_import:dict):
+def convert_numeric_values(table:Table,fields_to_import:dict,schema_cache:Optional[SchemaCache]=None):
+    # look up the table schema once rather than for every field
+    table_schema = None
+    if schema_cache is None:
+        table_schema = table.schema()
     for key,val in fields_to_import.items():
-        field = table.schema().field(key)
-        if field.type  == 'number':
+        if schema_cache is not None:
+            field_type = schema_cache.field_type(table.name,key)
+        else:
+            field_type = table_schema.field(key).type
+        if field_type  == 'number':
             fields_to_import[key] = int(val)
 
     return fields_to_import
@@ -589,60 +1180,152 @@ def check_field_errors(input:dict,output:RecordDict) -> True:
                 errors.append(key)
     if len(errors) > 0:
         err_str = ", ".join(errors)
-        print(f"The following fields for Student ID {output['fields']['ID']} could not be imported: {err_str}")
+        log.warning(f"The following fields for Student ID {output['fields'].get('ID')} could not be imported: {err_str}",extra={'data': {'sent': input, 'written': output}})
         return True
     else:
         return False
 
-def update_student(student_record:RecordDict,fields_to_update:dict,students_table:Table) -> bool:
+def update_student(student_record:RecordDict,fields_to_update:dict,students_table:Table,schema_cache:Optional[SchemaCache]=None) -> bool:
     at_record_id = student_record['id']
 
-    fields_to_update = convert_numeric_values(students_table,fields_to_update)
+    fields_to_update = convert_numeric_values(students_table,fields_to_update,schema_cache)
     try:
         updated_student = students_table.update(at_record_id,fields_to_update)
     except:
-         print(f"Unable to update Student ID {student_record['fields']['ID']} with {str(fields_to_update)}")
+         log.error(f"Unable to update Student ID {student_record['fields']['ID']} with {str(fields_to_update)}",extra={'data': fields_to_update})
          return False
     if check_field_errors(fields_to_update,updated_student):
         return False
     else:
-        print(f"Successfully updated Student ID {student_record['fields']['ID']} with {str(fields_to_update)}")
+        log.info(f"Successfully updated Student ID {student_record['fields']['ID']} with {str(fields_to_update)}",extra={'data': fields_to_update})
         return True
 
-def create_student(student_to_create:dict,students_table:Table) -> RecordDict:
-    student_to_create = convert_numeric_values(students_table,student_to_create)
+def create_student(student_to_create:dict,students_table:Table,schema_cache:Optional[SchemaCache]=None) -> RecordDict:
+    student_to_create = convert_numeric_values(students_table,student_to_create,schema_cache)
     try:
         created_student = students_table.create(student_to_create)
-        print(f"Successfully created Student ID {created_student['fields']['ID']} with Student details: {str(created_student['fields'])}")
+        log.info(f"Successfully created Student ID {created_student['fields']['ID']} with Student details: {str(created_student['fields'])}",extra={'data': created_student})
         return created_student
     except Exception:
-        print(f"Unable to create Student with Student details: ")
-        print_dict(student_to_create)
+        log.error(f"Unable to create Student with Student details: \n{json.dumps(student_to_create, indent=4)}",extra={'data': student_to_create})
         return False
 
 def create_grade(grade_dict:dict,grade_table) -> RecordDict:
     #grades_dict = convert_numeric_values(students_table,students_table)
     try:
         created_grade = grade_table.create(grade_dict)
-        print(f"Successfully created Grade ID {created_grade['fields']['Score ID']} with details: {str(grade_dict)}")
+        log.info(f"Successfully created Grade ID {created_grade['fields']['Score ID']} with details: {str(grade_dict)}",extra={'data': created_grade})
         return created_grade
     except HTTPError as e:
-         print(f"Unable to create Grade with details: ")
-         print_dict(grade_dict)
-         print(e)
+         log.error(f"Unable to create Grade with details: \n{json.dumps(grade_dict, indent=4)}\n{e}",extra={'data': grade_dict})
          return False
 
 def update_grade(grade_dict:dict,grade_to_update:str,grade_table):
     try:
         updated_grade = grade_table.update(grade_to_update,grade_dict)
-        print(f"Successfully updated Grade ID {updated_grade['fields']['Score ID']} with details: {str(grade_dict)}")
+        log.info(f"Successfully updated Grade ID {updated_grade['fields']['Score ID']} with details: {str(grade_dict)}",extra={'data': updated_grade})
         return updated_grade
     except HTTPError as e:
-         print(f"Unable to update Grade with details: ")
-         print_dict(grade_dict)
-         print(e)
+         log.error(f"Unable to update Grade with details: \n{json.dumps(grade_dict, indent=4)}\n{e}",extra={'data': grade_dict})
          return False
 
+# past tense of each write action, for messages and journalled outcomes
+WRITE_OUTCOMES = {'create': 'created', 'update': 'updated', 'upsert': 'upserted'}
+
+class BatchWriter:
+    """Queue creates, updates and upserts for one Airtable table and send them
+    through pyairtable's batch calls, 10 records per request.
+
+    Each queued record keeps the CSV row it came from so failed writes can be
+    reported against the import file. If Airtable rejects a whole batch, its
+    records are retried one at a time to find the ones at fault.
+    """
+    BATCH_SIZE = 10
+
+    def __init__(self,table:Table,record_label:str='Record',on_success=None):
+        self.table = table
+        self.record_label = record_label
+        # called as on_success(action, csv_row, fields, written_record) for each record written
+        self.on_success = on_success
+        self.queues = {'create': [], 'update': [], 'upsert': []}
+        self.upsert_key_fields = None
+        self.succeeded = []
+        self.failed = []
+
+    def queue_create(self,fields:dict,csv_row:int):
+        self.queue('create',csv_row,{'fields': fields})
+
+    def queue_update(self,record_id:str,fields:dict,csv_row:int):
+        self.queue('update',csv_row,{'id': record_id, 'fields': fields})
+
+    def queue_upsert(self,fields:dict,key_fields:List[str],csv_row:int):
+        if self.upsert_key_fields not in (None,key_fields):
+            self.flush_action('upsert')
+        self.upsert_key_fields = key_fields
+        self.queue('upsert',csv_row,{'fields': fields})
+
+    def queue(self,action:str,csv_row:int,record:dict):
+        self.queues[action].append((csv_row,record))
+        if len(self.queues[action]) >= self.BATCH_SIZE:
+            self.flush_action(action)
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def flush(self):
+        for action in self.queues.keys():
+            self.flush_action(action)
+
+    def flush_action(self,action:str):
+        queue = self.queues[action]
+        self.queues[action] = []
+        for start in range(0,len(queue),self.BATCH_SIZE):
+            chunk = queue[start:start+self.BATCH_SIZE]
+            try:
+                written = self.send(action,[record for _,record in chunk])
+            except (HTTPError,ValueError) as e:
+                if len(chunk) == 1:
+                    self.record_failure(action,chunk[0],e)
+                    continue
+                # find which records in the batch were rejected
+                for item in chunk:
+                    try:
+                        written_item = self.send(action,[item[1]])
+                    except (HTTPError,ValueError) as e:
+                        self.record_failure(action,item,e)
+                        continue
+                    self.record_success(action,item,written_item[0])
+                continue
+            for item,written_record in zip(chunk,written):
+                self.record_success(action,item,written_record)
+
+    def send(self,action:str,records:List[dict]) -> List[RecordDict]:
+        if action == 'create':
+            return self.table.batch_create([record['fields'] for record in records])
+        elif action == 'update':
+            return self.table.batch_update(records)
+        else:
+            return self.table.batch_upsert(records,key_fields=self.upsert_key_fields)['records']
+
+    def record_success(self,action:str,item:Tuple[int,dict],written_record:RecordDict):
+        csv_row, record = item
+        self.succeeded.append((csv_row,action,written_record))
+        log.info(f"CSV row {csv_row}: Successfully {WRITE_OUTCOMES[action]} {self.record_label} {written_record['id']} with details: {str(record['fields'])}",extra={'data': {'csv_row': csv_row, 'action': action, 'record': written_record}})
+        if self.on_success is not None:
+            self.on_success(action,csv_row,record['fields'],written_record)
+
+    def record_failure(self,action:str,item:Tuple[int,dict],error:Exception):
+        csv_row, record = item
+        self.failed.append((csv_row,action,record['fields'],str(error)))
+        log.error(f"CSV row {csv_row}: Unable to {action} {self.record_label} with details: \n{json.dumps(record['fields'], indent=4)}\n{error}",extra={'data': {'csv_row': csv_row, 'action': action, 'fields': record['fields'], 'error': str(error)}})
+
+    def print_failed_rows(self):
+        if len(self.failed) == 0:
+            return
+        log.error(f"{len(self.failed)} {self.record_label} write(s) failed:")
+        for csv_row, action, fields, error in self.failed:
+            log.error(f"    CSV row {csv_row}: {action} failed - {error}")
+
 def remind_if_test_mode(test_flag,reminder_before_import:bool=True):
     if test_flag:
         if reminder_before_import:
@@ -650,29 +1333,54 @@ def remind_if_test_mode(test_flag,reminder_before_import:bool=True):
         else:
             print(f"Test mode - no actual import completed".upper())
 
-def import_students(import_data:List[ImportRecord],student_records:List[RecordDict],grad_year:str,students_table:Table,test_flag:bool=True):
+def import_students(import_data:List[ImportRecord],student_records:List[RecordDict],grad_year:str,students_table:Table,test_flag:bool=True,batch:bool=False,schema_cache:Optional[SchemaCache]=None,journal:Optional[ImportJournal]=None):
     count_total = 0
     count_updated = 0
     count_created = 0
+    count_failed = 0
+
+    # nothing is written in test mode, so nothing is journalled
+    def journal_outcome(csv_row,outcome,record_id=None,fields=None):
+        if journal is not None and not test_flag:
+            journal.record(csv_row,outcome,record_id=record_id,fields=fields)
+
+    # in batch mode, writes are queued and counted once Airtable confirms them
+    writer = None
+    if batch and not test_flag:
+        def student_written(action,csv_row,fields,written_student):
+            nonlocal count_created, count_updated
+            field_errors = check_field_errors(fields,written_student)
+            if action == 'create':
+                count_created += 1
+            elif not field_errors:
+                count_updated += 1
+            journal_outcome(csv_row,WRITE_OUTCOMES[action],written_student['id'],fields)
+        writer = BatchWriter(students_table,'Student',on_success=student_written)
 
     # Get next available airtable ID for the relevant student records - in case a new record is needed
     at_student_id = get_next_at_student_id(grad_year,student_records)
 
+    # index students once for matching every CSV row
+    student_index = StudentIndex(student_records)
+
     # loop through Import Records
+    completed = False
     for import_record in import_data:
-        print(f"""
+        if journal is not None and journal.done(import_record.get('csv_row')):
+            continue
+        log.info(f"""
 --------
 Now importing CSV row {import_record.get('csv_row')}...
         """)
         import_outcome = None
 
         # match to existing student by ZNum
-        import_record.match_to_at_student(student_records)
+        import_record.match_to_at_student(student_index)
 
         # match to existing student by Name
         if import_record.match_type == 'no match':
             try:
-                import_record = find_match_by_name(import_record,student_records)
+                import_record = find_match_by_name(import_record,student_index)
             except UserQuitOut:
                 print(f"Quitting program...")
                 break
@@ -693,15 +1401,25 @@ Now importing CSV row {import_record.get('csv_row')}...
                 break
             if choice == 'No':
                 print(f"Skipping student...")
+                journal_outcome(import_record.get('csv_row'),'skipped')
                 continue
             remind_if_test_mode(test_flag,False)
             if test_flag == True:
                 import_outcome = True
+            elif writer is not None:
+                writer.queue_create(convert_numeric_values(students_table,student_template,schema_cache),import_record.get('csv_row'))
+                # reserve the ID now so later new students don't reuse it, count once written
+                import_record.at_id = at_student_id
+                import_record.at_edit_type = 'new'
+                at_student_id += 1
             else:
-                created_student = create_student(student_template,students_table)
+                created_student = create_student(student_template,students_table,schema_cache)
                 if created_student != False:
                     import_outcome = True # if record was created, import was successful enough that the at ID should be incremented
                     check_field_errors(student_template, created_student)
+                    journal_outcome(import_record.get('csv_row'),'created',created_student['id'],student_template)
+                else:
+                    count_failed += 1
             if import_outcome == True:
                 import_record.at_id = at_student_id
                 import_record.at_edit_type = 'new'
@@ -717,7 +1435,8 @@ Now importing CSV row {import_record.get('csv_row')}...
             db_fields = db_student['fields']
             keys_to_update = compare_records(csv_fields,db_fields)
             if len(keys_to_update) == 0:
-                print(f"No data to update on Student Record {db_fields['ID']}, skipping student.")
+                log.info(f"No data to update on Student Record {db_fields['ID']}, skipping student.")
+                journal_outcome(import_record.get('csv_row'),'unchanged',db_student['id'])
                 continue
             fields_to_import = {}
 
@@ -742,14 +1461,22 @@ Now importing CSV row {import_record.get('csv_row')}...
             # move forward with updating the student record
             if test_flag == True:
                 if len(fields_to_import) == 0:
-                    print("No fields to update, skipping...")
+                    log.info("No fields to update, skipping...")
                 else:
                     import_outcome = True
             else:
                 if len(fields_to_import) == 0:
-                    print("No fields to update, skipping...")
+                    log.info("No fields to update, skipping...")
+                    journal_outcome(import_record.get('csv_row'),'skipped',db_student['id'])
+                elif writer is not None:
+                    writer.queue_update(db_student['id'],convert_numeric_values(students_table,fields_to_import,schema_cache),import_record.get('csv_row'))
+                    import_record.at_edit_type = 'edit'
                 else:
-                    import_outcome = update_student(db_student,fields_to_import,students_table)
+                    import_outcome = update_student(db_student,fields_to_import,students_table,schema_cache)
+                    if import_outcome == True:
+                        journal_outcome(import_record.get('csv_row'),'updated',db_student['id'],fields_to_import)
+                    else:
+                        count_failed += 1
             if import_outcome == True:
                 import_record.at_edit_type = 'edit'
                 count_updated += 1
@@ -759,143 +1486,292 @@ Now importing CSV row {import_record.get('csv_row')}...
         remind_if_test_mode(test_flag,False)
         # if test_flag:
         #     print(f"Test mode - no actual import completed".upper())
+    else:
+        # every row was gone through without quitting
+        completed = True
 
-    return count_total, count_created, count_updated
+    if writer is not None:
+        writer.flush()
+        writer.print_failed_rows()
+        count_failed += len(writer.failed)
+    completed = completed and count_failed == 0
+    if journal is not None:
+        journal.finish('student row(s)',completed)
+
+    return count_total, count_created, count_updated, completed
 
 def convert_xlsx_with_openpyxl(xlsx_file, csv_file):
     """
     Converts a single sheet of an XLSX file to a CSV file,
     skipping the first row (header).
     """
-    wb = openpyxl.load_workbook(
-        xlsx_file,
-        read_only=True,
-        data_only=True
-    )
+    with open(csv_file, 'w', newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerows(xlsx_rows(xlsx_file))
+
+    log.info(f"Successfully converted '{xlsx_file}' to '{csv_file}'")
+
+# Options for naming import files, and the date each exam was given in each school year
+EXAM_YEARS = [
+    "2012", "2013", "2014", "2015", "2016", "2017", "2018",
+    "2019", "2020", "2021", "2022", "2023", "2024", "2025",
+    "2026", "2027", "2028"
+]
+FORMS = ["Form 1", "Form 2", "Form 3", "Form 4"]
+TEST_TYPES = [
+    "KCSE",
+    "Term 1 - Entry",
+    "Term 1 - Mid Term",
+    "Term 1 - End Term",
+    "Term 1 - Other",
+    "Term 2 - Entry",
+    "Term 2 - Mid Term",
+    "Term 2 - End Term",
+    "Term 2 - Other",
+    "Term 3 - Entry",
+    "Term 3 - End Term",
+    "Term 3 - Mid Term",
+]
+TEST_DATES = {
+    "2021": {
+        "Term 1 - Entry": "2021-07-26",
+        "Term 1 - Mid Term": "2021-08-28",
+        "Term 1 - End Term": "2021-10-01",
+        "Term 2 - Entry": "2021-10-11",
+        "Term 2 - Mid Term": "2021-11-16",
+        "Term 2 - End Term": "2021-12-23",
+        "Term 3 - Entry": "2022-01-03",
+        "Term 3 - Mid Term": "2022-02-03",
+        "Term 3 - End Term": "2022-03-04",
+    },
+    "2022": {
+        "Term 1 - Entry": "2022-04-25",
+        "Term 1 - Mid Term": "2022-05-28",
+        "Term 1 - End Term": "2022-07-01",
+        "Term 2 - Entry": "2022-07-11",
+        "Term 2 - Mid Term": "2022-08-13",
+        "Term 2 - End Term": "2022-09-16",
+        "Term 3 - Entry": "2022-09-26",
+        "Term 3 - Mid Term": "2022-10-25",
+        "Term 3 - End Term": "2022-11-25",
+    },
+    "2023": {
+        "Term 1 - Entry": "2023-01-23",
+        "Term 1 - Mid Term": "2023-03-09",
+        "Term 1 - End Term": "2023-04-21",
+        "Term 2 - Entry": "2023-05-08",
+        "Term 2 - Mid Term": "2023-06-24",
+        "Term 2 - End Term": "2023-08-11",
+        "Term 3 - Entry": "2023-08-28",
+        "Term 3 - Mid Term": "2023-09-30",
+        "Term 3 - End Term": "2023-11-03",
+    },
+    "2024": {
+        "Term 1 - Entry": "2024-01-08",
+        "Term 1 - Mid Term": "2024-02-21",
+        "Term 1 - End Term": "2024-04-05",
+        "Term 2 - Entry": "2024-04-29",
+        "Term 2 - Mid Term": "2024-06-15",
+        "Term 2 - End Term": "2024-08-02",
+        "Term 3 - Entry": "2024-08-26",
+        "Term 3 - Mid Term": "2024-09-25",
+        "Term 3 - End Term": "2024-10-25",
+    },
+    "2025": {
+        "Term 1 - Entry": "2025-01-06",
+        "Term 1 - Mid Term": "2025-02-19",
+        "Term 1 - End Term": "2025-04-04",
+        "Term 2 - Entry": "2025-04-28",
+        "Term 2 - Mid Term": "2025-06-14",
+        "Term 2 - End Term": "2025-08-01",
+        "Term 3 - Entry": "2025-08-25",
+        "Term 3 - Mid Term": "2025-09-24",
+        "Term 3 - End Term": "2025-10-24",
+    },
+    "2026": {
+        "Term 1 - Entry": "2026-01-12",
+        "Term 1 - Mid Term": "2026-02-25",
+        "Term 1 - End Term": "2026-04-02",
+        "Term 2 - Entry": "2026-04-27",
+        "Term 2 - Mid Term": "2026-06-24",
+        "Term 2 - End Term": "2026-07-31",
+        "Term 3 - Entry": "2026-08-24",
+        "Term 3 - Mid Term": "2026-09-15",
+        "Term 3 - End Term": "2026-10-23"
+    }
+}
+
+def exam_date(year_of_exam:str,test_type:str) -> Optional[str]:
+    "Date of an exam from TEST_DATES, or None if it isn't known"
+    if test_type == 'KCSE':
+        return f'{year_of_exam}-11-20'
+    return TEST_DATES.get(year_of_exam,{}).get(test_type)
 
-    sh = wb.active # Get the active worksheet
+def infer_standard_filename(text:str) -> Optional[str]:
+    """Work out the standard CSV file name from a Zeraki file name or merit list title,
+    e.g. "Form 3 Term 1 Opener Exam 2022" -> "C2023 - Term 1 - Entry - Form 3 - 2022-04-25.csv"
 
-    rows = sh.iter_rows(values_only=True)
+    The exam is looked up in TEST_DATES by the school year in the text. The grad class is
+    taken from the text (C2023 or Class of 2023) or counted on from the school year and form.
 
-    # Skip the first row (header)
-    next(rows, None)
+    Returns:
+        str: the file name, or None if the form, exam or year can't be told from the text
+            (including when it has more than one year the exam could be from)
+    """
+    lowered = text.lower()
+    form_match = re.search(r'\bform\s*([1-4])\b',lowered)
+    year_matches = re.findall(r'\b(20\d{2})\b',lowered)
+    if form_match is None or not year_matches:
+        return None
+    form = f"Form {form_match.group(1)}"
+
+    term_match = re.search(r'\bterm\s*([1-3])\b',lowered)
+    if 'kcse' in lowered:
+        # Form 4 mocks are named after KCSE too, and must not be imported as the real results
+        if 'mock' in lowered or term_match is not None:
+            return None
+        test_type = 'KCSE'
+    else:
+        if term_match is None:
+            return None
+        if re.search(r'\bmid',lowered):
+            kind = 'Mid Term'
+        elif re.search(r'\bend\b|\bend[\s-]*term',lowered):
+            kind = 'End Term'
+        elif re.search(r'\b(entry|opener|opening)\b',lowered):
+            kind = 'Entry'
+        else:
+            return None
+        test_type = f"Term {term_match.group(1)} - {kind}"
+
+    grad_match = re.search(r'\b(?:c|class\s+of\s+)(20\d{2})\b',lowered)
+    exam_years = set(year for year in year_matches if grad_match is None or year != grad_match.group(1)) or set(year_matches)
+    if len(exam_years) > 1:
+        # e.g. a download date as well as the exam year, so leave it to the user
+        return None
+    year_of_exam = exam_years.pop()
+    test_date = exam_date(year_of_exam,test_type)
+    if test_date is None:
+        return None
+    if grad_match is not None:
+        grad_year = grad_match.group(1)
+    else:
+        grad_year = str(int(year_of_exam) + 4 - int(form_match.group(1)))
+    return f"C{grad_year} - {test_type} - {form} - {test_date}.csv"
 
+def infer_xlsx_filename(stem:str,title:str) -> Optional[str]:
+    """Work out the standard CSV file name from the merit list title, falling back to the file name.
+
+    Returns:
+        str: the file name, or None if neither can be read or they disagree
+    """
+    from_title = infer_standard_filename(title)
+    from_stem = infer_standard_filename(stem)
+    if from_title is not None and from_stem is not None and from_title != from_stem:
+        return None
+    if from_title is not None or from_stem is not None:
+        return from_title or from_stem
+    # each may hold only part of the details, e.g. the form and exam in the title and the year in the name
+    return infer_standard_filename(f"{title} {stem}")
+
+def convert_xlsx_file(xlsx_file:str,csv_file:Optional[str]=None) -> Tuple[str,Optional[str],str]:
+    """Convert an XLSX file to CSV, naming the CSV from the file name or sheet title if csv_file isn't given.
+
+    Returns:
+        Tuple[str,Optional[str],str]: (xlsx file, CSV written or None if no name could be
+            worked out, sheet title)
+    """
+    rows = xlsx_rows(xlsx_file,include_title=True)
+    title = " ".join(value for value in next(rows,[]) if value)
+    if csv_file is None:
+        stem = os.path.splitext(os.path.basename(xlsx_file))[0]
+        try:
+            parse_standard_filename(f"{stem}.csv")
+            csv_name = f"{stem}.csv"
+        except ValueError:
+            csv_name = infer_xlsx_filename(stem,title)
+        if csv_name is None:
+            rows.close()
+            return xlsx_file, None, title
+        csv_file = os.path.join(os.path.dirname(xlsx_file),csv_name)
     with open(csv_file, 'w', newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        for row in rows:
-            writer.writerow([
-                value if value is not None else ""
-                for value in row
-            ])
+        writer.writerows(rows)
+    return xlsx_file, csv_file, title
+
+def convert_import_folder(folder_name:str='./to-import',max_workers:Optional[int]=None) -> List[Tuple[str,Optional[str]]]:
+    """Convert every XLSX file in the import folder to a standard named CSV, across processes.
 
-    print(f"Successfully converted '{xlsx_file}' to '{csv_file}'")
+    Names are worked out from each file's name or merit list title where possible. The
+    files left over are then named one at a time at the prompt and converted together.
+
+    Returns:
+        List[Tuple[str,Optional[str]]]: (XLSX file, CSV written or None if skipped or failed)
+    """
+    xlsx_files = [
+        os.path.join(folder_name,file_name) for file_name in sorted(list_files(folder_name))
+        if file_name.lower().endswith('.xlsx')
+    ]
+    results = {}
+    unnamed = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(convert_xlsx_file,xlsx_file) for xlsx_file in xlsx_files]
+        for xlsx_file, future in zip(xlsx_files,futures):
+            try:
+                _, csv_file, title = future.result()
+            except Exception as e:
+                log.error(f"Unable to convert {xlsx_file}: {type(e).__name__}: {e}")
+                results[xlsx_file] = None
+                continue
+            if csv_file is None:
+                unnamed.append((xlsx_file,title))
+            else:
+                log.info(f"Successfully converted '{xlsx_file}' to '{csv_file}'")
+                results[xlsx_file] = csv_file
+
+        # ask for the names that couldn't be worked out, then convert those together
+        named = []
+        for xlsx_file, title in unnamed:
+            print("")
+            print(f"Unable to work out the exam for {os.path.basename(xlsx_file)} ({title or 'no title'}).")
+            try:
+                csv_name = get_filename_from_user(xlsx_file)
+            except UserQuitOut:
+                log.warning(f"Skipping {xlsx_file} and any remaining files that need naming.")
+                break
+            named.append((xlsx_file,os.path.join(folder_name,os.path.basename(csv_name))))
+        futures = [pool.submit(convert_xlsx_file,xlsx_file,csv_file) for xlsx_file, csv_file in named]
+        for (xlsx_file, csv_file), future in zip(named,futures):
+            try:
+                future.result()
+            except Exception as e:
+                log.error(f"Unable to convert {xlsx_file}: {type(e).__name__}: {e}")
+                continue
+            log.info(f"Successfully converted '{xlsx_file}' to '{csv_file}'")
+            results[xlsx_file] = csv_file
+
+    converted = [(xlsx_file,results.get(xlsx_file)) for xlsx_file in xlsx_files]
+    print(f"Converted {len([c for c in converted if c[1]])} of {len(xlsx_files)} XLSX file(s) in {folder_name}.")
+    return converted
 
 def get_filename_from_user(original_file_name):
     """
     Gets information from user to determine standardized file name for CSV
     """
-    years = [
-        "2012", "2013", "2014", "2015", "2016", "2017", "2018",
-        "2019", "2020", "2021", "2022", "2023", "2024", "2025",
-        "2026", "2027", "2028"
-    ]
-    forms = ["Form 1", "Form 2", "Form 3", "Form 4"]
-    test_types = [
-        "KCSE",
-        "Term 1 - Entry",
-        "Term 1 - Mid Term",
-        "Term 1 - End Term",
-        "Term 1 - Other",
-        "Term 2 - Entry",
-        "Term 2 - Mid Term",
-        "Term 2 - End Term",
-        "Term 2 - Other",
-        "Term 3 - Entry",
-        "Term 3 - End Term",
-        "Term 3 - Mid Term",
-    ]
-    test_dates = {
-        "2021": {
-            "Term 1 - Entry": "2021-07-26",
-            "Term 1 - Mid Term": "2021-08-28",
-            "Term 1 - End Term": "2021-10-01",
-            "Term 2 - Entry": "2021-10-11",
-            "Term 2 - Mid Term": "2021-11-16",
-            "Term 2 - End Term": "2021-12-23",
-            "Term 3 - Entry": "2022-01-03",
-            "Term 3 - Mid Term": "2022-02-03",
-            "Term 3 - End Term": "2022-03-04",
-        },
-        "2022": {
-            "Term 1 - Entry": "2022-04-25",
-            "Term 1 - Mid Term": "2022-05-28",
-            "Term 1 - End Term": "2022-07-01",
-            "Term 2 - Entry": "2022-07-11",
-            "Term 2 - Mid Term": "2022-08-13",
-            "Term 2 - End Term": "2022-09-16",
-            "Term 3 - Entry": "2022-09-26",
-            "Term 3 - Mid Term": "2022-10-25",
-            "Term 3 - End Term": "2022-11-25",
-        },
-        "2023": {
-            "Term 1 - Entry": "2023-01-23",
-            "Term 1 - Mid Term": "2023-03-09",
-            "Term 1 - End Term": "2023-04-21",
-            "Term 2 - Entry": "2023-05-08",
-            "Term 2 - Mid Term": "2023-06-24",
-            "Term 2 - End Term": "2023-08-11",
-            "Term 3 - Entry": "2023-08-28",
-            "Term 3 - Mid Term": "2023-09-30",
-            "Term 3 - End Term": "2023-11-03",
-        },
-        "2024": {
-            "Term 1 - Entry": "2024-01-08",
-            "Term 1 - Mid Term": "2024-02-21",
-            "Term 1 - End Term": "2024-04-05",
-            "Term 2 - Entry": "2024-04-29",
-            "Term 2 - Mid Term": "2024-06-15",
-            "Term 2 - End Term": "2024-08-02",
-            "Term 3 - Entry": "2024-08-26",
-            "Term 3 - Mid Term": "2024-09-25",
-            "Term 3 - End Term": "2024-10-25",
-        },
-        "2025": {
-            "Term 1 - Entry": "2025-01-06",
-            "Term 1 - Mid Term": "2025-02-19",
-            "Term 1 - End Term": "2025-04-04",
-            "Term 2 - Entry": "2025-04-28",
-            "Term 2 - Mid Term": "2025-06-14",
-            "Term 2 - End Term": "2025-08-01",
-            "Term 3 - Entry": "2025-08-25",
-            "Term 3 - Mid Term": "2025-09-24",
-            "Term 3 - End Term": "2025-10-24",
-        },
-        "2026": {
-            "Term 1 - Entry": "2026-01-12",
-            "Term 1 - Mid Term": "2026-02-25",
-            "Term 1 - End Term": "2026-04-02",
-            "Term 2 - Entry": "2026-04-27",
-            "Term 2 - Mid Term": "2026-06-24",
-            "Term 2 - End Term": "2026-07-31",
-            "Term 3 - Entry": "2026-08-24",
-            "Term 3 - Mid Term": "2026-09-15",
-            "Term 3 - End Term": "2026-10-23"
-        }
-    }
     while True:
         # get score type
         print('Class of...')
-        grad_year = user_selection(years,True) #Could raise UserQuitOut
+        grad_year = user_selection(EXAM_YEARS,True) #Could raise UserQuitOut
         print('Take while in form...')
-        form = user_selection(forms,True) #Could raise UserQuitOut
+        form = user_selection(FORMS,True) #Could raise UserQuitOut
         print('Exam taken during calendar year...')
-        year_of_exam = user_selection(years,True)  #Could raise UserQuitOut
+        year_of_exam = user_selection(EXAM_YEARS,True)  #Could raise UserQuitOut
         print('Type of exam...')
-        test_type = user_selection(test_types,True)  #Could raise UserQuitOut
-        if test_type == 'KCSE':
-            test_date = f'{year_of_exam}-11-20'
-        else:
-            test_date = test_dates[year_of_exam][test_type]
+        test_type = user_selection(TEST_TYPES,True)  #Could raise UserQuitOut
+        test_date = exam_date(year_of_exam,test_type)
+        if test_date is None:
+            print(f'No date is known for {test_type} exams in {year_of_exam}, please choose again.')
+            continue
 
         print(f'Original file name is {original_file_name} ')
         new_file_name = f'./to-import/C{grad_year} - {test_type} - {form} - {test_date}.csv'
@@ -940,96 +1816,266 @@ def parse_standard_filename(filename):
     return grad_year, test_type, test_date, form
 
 # Grades functions
-def import_grades(import_data:List[ImportRecord],student_records:List[RecordDict],grd_tbl:Table,test_flag:bool=True):
-    print("")
-    print(f"Would you like to check for duplicates and approve each grade before importing?")
-    remind_if_test_mode(test_flag)
-    print('Please select Y/N:')
-    choice = user_selection(options_list=['Yes','No'],quit_allowed=True) #could raise UserQuitOut
-    if choice == 'Yes':
+# Single line text field on Test Scores holding grade_natural_key, used to upsert grades
+GRADE_KEY_FIELD = 'Import Key'
+
+def grade_natural_key(fields:dict) -> str:
+    """Stable text key for a grade: student, form, score type, subject and date of score.
+
+    Airtable can't upsert on linked record fields, so the key is stored in GRADE_KEY_FIELD.
+    """
+    student_ids = fields.get('Student ID') or []
+    return " | ".join([
+        ",".join(student_ids),
+        str(fields.get('Form')),
+        str(fields.get('Score Type')),
+        str(fields.get('Subject')),
+        str(fields.get('Date of Score')),
+    ])
+
+def grade_dup_key(fields:dict,match_on_date:bool=False) -> Tuple:
+    """Build the key used to match an import grade to an existing Test Scores record.
+
+    Args:
+        fields (dict): grade fields, either an import grade dict or an Airtable record's fields
+        match_on_date (bool): also require the Date of Score to match
+
+    Returns:
+        Tuple: (Student ID, Score Type, Form, Subject[, Date of Score]), with None for missing values
+    """
+    student_ids = fields.get('Student ID')
+    key = (
+        tuple(student_ids) if student_ids else None,
+        fields.get('Score Type'),
+        fields.get('Form'),
+        fields.get('Subject'),
+    )
+    if match_on_date:
+        key = key + (fields.get('Date of Score'),)
+    return key
+
+# Test Scores fields needed to find a duplicate grade and compare it with the import
+GRADE_COMPARE_FIELDS = ['Student ID','Date of Score','Form','Score Type','Subject','Letter Score','Numeric Score']
+
+# Primary field of Students, which is what a linked Student ID shows as in a formula
+STUDENT_PRIMARY_FIELD = 'ID'
+
+def build_grade_dup_index(grd_tbl:Table,test_type:str,form:str,match_on_date:bool=False,record_cache:Optional[RecordCache]=None,students:Optional[List[RecordDict]]=None) -> dict:
+    """Fetch the existing Test Scores for a test type and form once and index them for duplicate checks.
+
+    Args:
+        grd_tbl (Table): Test Scores table
+        test_type (str): Score Type of the grades being imported
+        form (str): Form the grades being imported were taken in
+        match_on_date (bool): include the Date of Score in the index key
+        record_cache (RecordCache): optional local cache to read the grades through
+        students (List[RecordDict]): if given, only fetch grades linked to these students
+
+    Returns:
+        dict: grade_dup_key -> existing Airtable grade record
+    """
+    formula = formulas.match({'Score Type': test_type, 'Form': form})
+    if students is not None:
+        student_keys = sorted(set(str(student['fields'][STUDENT_PRIMARY_FIELD]) for student in students))
+        if len(student_keys) == 0:
+            return {}
+        student_formula = formulas.OR(*[f"ARRAYJOIN({{Student ID}})={formulas.to_airtable_value(key)}" for key in student_keys])
+        formula = formulas.AND(formula,student_formula)
+    dup_index = {}
+    for grd in fetch_records(grd_tbl,record_cache,formula=formula,fields=GRADE_COMPARE_FIELDS):
+        key = grade_dup_key(grd['fields'],match_on_date)
+        if None in key:
+            # records missing any key field can't be a duplicate
+            continue
+        # keep the first record found for a key, as the full table scan used to
+        dup_index.setdefault(key,grd)
+    return dup_index
+
+def import_grades(import_data:List[ImportRecord],student_records:List[RecordDict],grd_tbl:Table,test_flag:bool=True,match_dup_on_date:bool=False,batch:bool=False,record_cache:Optional[RecordCache]=None,auto_approve:bool=False,upsert:bool=False,journal:Optional[ImportJournal]=None):
+    # auto_approve checks for duplicates without asking: new grades are created and duplicates skipped
+    # upsert skips the duplicate check and lets Airtable create or update each grade by its GRADE_KEY_FIELD
+    if upsert:
+        approve_each_and_dup_check = False
+    elif auto_approve:
         approve_each_and_dup_check = True
     else:
-        approve_each_and_dup_check = False
+        print("")
+        print(f"Would you like to check for duplicates and approve each grade before importing?")
+        remind_if_test_mode(test_flag)
+        print('Please select Y/N:')
+        choice = user_selection(options_list=['Yes','No'],quit_allowed=True) #could raise UserQuitOut
+        if choice == 'Yes':
+            approve_each_and_dup_check = True
+        else:
+            approve_each_and_dup_check = False
 
     # keep track of number of student records updated, grades created
     count_unmatched_students = 0
     count_matched_students = 0
     count_imported_grades = 0
     count_imported_with_errors = 0
+    count_failed = 0
+
+    # Fetch existing grades once for duplicate checks, rather than once per grade,
+    # only for the students in the file that match an Airtable record
+    dup_index = {}
+    student_index = StudentIndex(student_records)
+    if approve_each_and_dup_check and len(import_data) > 0:
+        matched_students = {}
+        for import_rec in import_data:
+            import_rec.match_to_at_student(student_index)
+            if import_rec.get('at_id') != None:
+                matched_students[import_rec.matched_record['id']] = import_rec.matched_record
+        dup_index = build_grade_dup_index(grd_tbl,import_data[0].get('test_type'),import_data[0].get('form'),match_dup_on_date,record_cache,list(matched_students.values()))
+
+    # nothing is written in test mode, so nothing is journalled
+    def journal_outcome(csv_row,grade,outcome,record_id=None):
+        if journal is not None and not test_flag:
+            journal.record(csv_row,outcome,grade['Subject'],record_id,grade if record_id is not None else None)
+
+    def grade_written(action,csv_row,grade,written_grade):
+        nonlocal count_imported_grades, count_imported_with_errors
+        # keep the duplicate index current so repeated rows in the file are caught
+        if approve_each_and_dup_check:
+            dup_index[grade_dup_key(grade,match_dup_on_date)] = written_grade
+        if check_field_errors(grade, written_grade):
+            count_imported_with_errors+=1
+        else:
+            count_imported_grades += 1
+        journal_outcome(csv_row,grade,WRITE_OUTCOMES[action],written_grade['id'])
+
+    # in batch and upsert modes, writes are queued and sent 10 grades per request
+    writer = None
+    queued_keys = set()
+    if (batch or upsert) and not test_flag:
+        writer = BatchWriter(grd_tbl,'Grade',on_success=grade_written)
 
     # Loop through import data
-    for import_rec in import_data:
-        import_rec.match_to_at_student(student_records)
+    for import_rec in progress(import_data,'Importing grades'):
+        import_rec.match_to_at_student(student_index)
         if import_rec.get('at_id') == None:
-            print(f"No airtable record found for student {import_rec.name()}. Skipping...")
+            log.warning(f"CSV row {import_rec.get('csv_row')}: No airtable record found for student {import_rec.name()}. Skipping...")
             count_unmatched_students+=1
             continue
         else:
             count_matched_students+=1
         grade_list = import_rec.return_grades_import_list()
         for grade in grade_list:
+            if journal is not None and journal.done(import_rec.get('csv_row'),grade['Subject']):
+                continue
             found_dup = False
+            if upsert:
+                grade[GRADE_KEY_FIELD] = grade_natural_key(grade)
 
             if approve_each_and_dup_check:
-                # Check for a duplicate grade record
-                for grd in grd_tbl.all():
-                    try:
-                        #TODO test change this to check for test type not date
-                        if grd['fields']['Student ID'] == grade['Student ID'] and grd['fields']['Score Type'] == grade['Score Type'] and grd['fields']['Form'] == grade['Form'] and grd['fields']['Subject'] == grade['Subject']:
-
-                            print(f"There is already a {grade['Subject']} grade for student {import_rec.name()} for a {grade['Form']} {grade['Score Type']} exam:")
-                            keys_to_update = compare_records(grade,grd['fields'])
-                            found_dup = True
-                            dup_grade = grd['id']
-                            break
-                    except KeyError:
-                        continue
+                # Check for a duplicate grade record, sending queued grades first if one might match
+                dup_key = grade_dup_key(grade,match_dup_on_date)
+                if dup_key in queued_keys:
+                    writer.flush()
+                    queued_keys.clear()
+                grd = dup_index.get(dup_key)
+                if grd is not None:
+                    show = log.info if auto_approve else print
+                    show(f"There is already a {grade['Subject']} grade for student {import_rec.name()} for a {grade['Form']} {grade['Score Type']} exam:")
+                    keys_to_update = compare_records(grade,grd['fields'],prompting=not auto_approve)
+                    found_dup = True
+                    dup_grade = grd['id']
 
                 if found_dup and len(keys_to_update)>0:
+                    if auto_approve:
+                        log.info("Skipping grade that differs from the existing record, existing grades aren't changed without approval... \n")
+                        journal_outcome(import_rec.get('csv_row'),grade,'skipped')
+                        continue
                     print(f"Would you like to update the Airtable record with the data above?")
                 elif found_dup==False:
-                    print(f"Would you like to create an Airtable record with the following data:")
-                    print_dict(grade)
+                    if not auto_approve:
+                        print(f"Would you like to create an Airtable record with the following data:")
+                        print_dict(grade)
                 else:
                     choice="No"
-                    print("Skipping grade because of duplicate... \n")
+                    log.info("Skipping grade because of duplicate... \n")
+                    journal_outcome(import_rec.get('csv_row'),grade,'unchanged',dup_grade)
                     continue
-                remind_if_test_mode(test_flag)
-                print('Please select Y/N:')
-                try:
-                    choice = user_selection(options_list=['Yes','No'],quit_allowed=True)
-                except UserQuitOut:
-                    print_grade_import_summary(count_imported_grades,count_matched_students,count_unmatched_students)
-                    raise UserQuitOut
+                if auto_approve:
+                    choice = "Yes"
+                else:
+                    remind_if_test_mode(test_flag)
+                    print('Please select Y/N:')
+                    try:
+                        choice = user_selection(options_list=['Yes','No'],quit_allowed=True)
+                    except UserQuitOut:
+                        if writer is not None:
+                            writer.flush()
+                            writer.print_failed_rows()
+                        print_grade_import_summary(count_imported_grades,count_matched_students,count_unmatched_students)
+                        raise UserQuitOut
             else:
                 choice = "Yes"
             if choice == 'No':
-                print(f"Skipping grade...")
+                log.info(f"Skipping grade...")
+                journal_outcome(import_rec.get('csv_row'),grade,'skipped')
                 continue
             if test_flag == True:
                 count_imported_grades += 1
+            elif writer is not None:
+                if upsert:
+                    writer.queue_upsert(grade,[GRADE_KEY_FIELD],import_rec.get('csv_row'))
+                elif found_dup:
+                    writer.queue_update(dup_grade,grade,import_rec.get('csv_row'))
+                else:
+                    writer.queue_create(grade,import_rec.get('csv_row'))
+                if approve_each_and_dup_check:
+                    queued_keys.add(dup_key)
             else:
                 if found_dup:
                     created_grade = update_grade(grade,dup_grade,grd_tbl)
                 else:
                     created_grade = create_grade(grade,grd_tbl)
                 if created_grade == False:
-                    print("Failed to import record.")
+                    log.error("Failed to import record.")
+                    count_failed += 1
                 else:
-                    if check_field_errors(grade, created_grade):
-                        count_imported_with_errors+=1
-                    else:
-                        count_imported_grades += 1
-
+                    grade_written('update' if found_dup else 'create',import_rec.get('csv_row'),grade,created_grade)
+
+    if writer is not None:
+        writer.flush()
+        writer.print_failed_rows()
+        count_failed += len(writer.failed)
+    completed = count_failed == 0
+    if journal is not None:
+        journal.finish('grade(s)',completed)
     print_grade_import_summary(count_imported_grades,count_matched_students,count_unmatched_students)
+    return count_imported_grades, count_matched_students, count_unmatched_students, completed
+
+def grade_key_field_exists(schema_cache:SchemaCache,grades_table:Table) -> bool:
+    try:
+        schema_cache.field(grades_table.name,GRADE_KEY_FIELD)
+    except ValueError:
+        log.error(f"Test Scores has no '{GRADE_KEY_FIELD}' field to upsert grades on. Copy scripts/create-grade-import-keys.py to the project folder and run it to add it.")
+        return False
     return True
 
+def grade_import_key(import_rec:ImportRecord) -> str:
+    "What a file's grades are imported as, so the journal starts afresh if the test details change"
+    return f"grades/{import_rec.get('test_type')}/{import_rec.get('form')}/{import_rec.get('test_date')}"
+
 def print_grade_import_summary(count_imported_grades,count_matched_students,count_unmatched_students):
     print(f"{count_imported_grades} grades imported for {count_matched_students} students.")
     if count_unmatched_students > 0:
         print(f"Grades not imported for {count_unmatched_students} due to not being able to match to a student record in Airtable")
 
-def main_import(test=True):
+def confirm_import_again(manifest:ImportManifest,file_path:str,import_type:str) -> bool:
+    "Ask whether to go ahead if the manifest shows the file was imported before"
+    entry = manifest.find(file_path,import_type)
+    if entry is None:
+        return True
+    print("")
+    print(f"{os.path.basename(file_path)} was {already_imported_message(entry)} ({import_type}).")
+    print("Would you like to import it again?")
+    choice = user_selection(options_list=['Yes','No'],quit_allowed=True) #could raise UserQuitOut
+    return choice == 'Yes'
+
+def main_import(test=True,batch=False,schema_cache_path=None,record_cache_path=None,upsert=False,journal_path=None,manifest_path=IMPORT_MANIFEST_PATH,match_dup_on_date=False):
     """Main program that calls user input functions and import functions
 
     Returns:
@@ -1052,6 +2098,19 @@ def main_import(test=True):
         except UserQuitOut:
             return False
 
+        # Check whether the file has been imported before
+        source_path = selected_file.name
+        import_kind = 'students' if import_type == import_type_options[0] else 'grades'
+        manifest = ImportManifest(manifest_path) if manifest_path else None
+        # a file imported before starts afresh in the journal if the user imports it again
+        restart_before = manifest.imported_time(source_path,import_kind) if manifest is not None else None
+        if manifest is not None:
+            try:
+                if not confirm_import_again(manifest,source_path,import_kind):
+                    return False
+            except UserQuitOut:
+                return False
+
         if selected_file.name.endswith('.csv'):
             # PARSE CSV IMPORT DATA
 
@@ -1082,24 +2141,23 @@ def main_import(test=True):
                 test_date = None
                 form = None
             
-            # Convert XSLX to CSV
-            convert_xlsx_with_openpyxl(selected_file.name, csv_name)
-
-            # Parse and Validate CSV
-            selected_file = open(csv_name,mode="r",newline='')
-            import_list = csv_to_import_records(selected_file)
+            # Parse the XLSX, writing it to the CSV to keep in the same pass
+            import_list = xlsx_to_import_records(selected_file.name, csv_name)
+            selected_file.close()
             
         # PULL RELEVANT RECORDS AND FIELDS FROM DB
         # Connect to Airtable Table: Students
         b = initialize_airtable()
         students_table = b.table('Students')
+        schema_cache = SchemaCache(b,schema_cache_path)
+        record_cache = RecordCache(record_cache_path) if record_cache_path else None
 
         # limit the fields to match on and edit in the students table
         student_import_fields = ['ID','First name','Last name','Grad Class','Zeraki ADM No','KCPE Score']
         
         # limit the records returned by grad year
         try:
-            student_records, grad_year= get_students_from_grad_year(student_import_fields,students_table,grad_year)
+            student_records, grad_year= get_students_from_grad_year(student_import_fields,students_table,grad_year,schema_cache,record_cache)
         except UserQuitOut:
             return False
 
@@ -1108,16 +2166,27 @@ def main_import(test=True):
 
             # IMPORT STUDENT DATA
             #import data and print outcome, if user quits out mid-import the summary statement will still show and the students up to that point will have been updated
-            total, created, updated = import_students(import_list,student_records,grad_year,students_table,test)
+            journal = ImportJournal(journal_path,selected_file.name,f"students/{grad_year}",restart_before) if journal_path and not test else None
+            try:
+                total, created, updated, completed = import_students(import_list,student_records,grad_year,students_table,test,batch=batch,schema_cache=schema_cache,journal=journal)
+            finally:
+                # students may have been written, so fetch them fresh next time
+                if record_cache is not None and not test:
+                    record_cache.invalidate(students_table)
             print(f"Out of {total} total CSV students, {created} new student records were created and {updated} student records were updated.")
-            return True
+            # the file stays in to-import, as its grades are usually imported next
+            if manifest is not None and not test and completed:
+                manifest.record(source_path,'students',(grad_year,test_type,test_date,form),(total,created,updated))
+            return completed
 
         # import test score details
         elif import_type == import_type_options[1]:
             
             # get test scores table
             grades_table = b.table('Test Scores')
-            scores_schema = grades_table.schema()
+            scores_schema = schema_cache.table(grades_table.name)
+            if upsert and not grade_key_field_exists(schema_cache,grades_table):
+                return False
 
             # Ask user for test type, test date and which form the student was in when test was taken
             # Check if details already in filename
@@ -1136,11 +2205,29 @@ def main_import(test=True):
             print("")
             print(f"Source file: {selected_file.name}")
             print(f"User will be importing {import_list[0].get('test_type')} scores from {import_list[0].get('test_date')} which were taken by the {grad_year} grad year when they were in {import_list[0].get('form')}")
+            journal = None
+            if journal_path and not test:
+                journal = ImportJournal(journal_path,selected_file.name,grade_import_key(import_list[0]),restart_before)
             try:
-                import_grades(import_list,student_records,grades_table,test) #could raise UserQuitOut
+                *counts, completed = import_grades(import_list,student_records,grades_table,test,match_dup_on_date,batch=batch,record_cache=record_cache,upsert=upsert,journal=journal) #could raise UserQuitOut
             except UserQuitOut:
                 return False
-            return True
+            finally:
+                # grades may have been written, so fetch them fresh next time
+                if record_cache is not None and not test:
+                    record_cache.invalidate(grades_table)
+            if not test and not completed:
+                print(f"Some grades couldn't be written, so {os.path.basename(source_path)} is left in to-import. Import it again to retry them.")
+            elif not test:
+                # remember the file and move it (and the CSV made from it) out of to-import
+                first = import_list[0]
+                if manifest is not None:
+                    manifest.record(source_path,'grades',(grad_year,first.get('test_type'),first.get('test_date'),first.get('form')),counts)
+                selected_file.close()
+                archive_import_file(source_path)
+                if source_path.lower().endswith('.xlsx'):
+                    archive_import_file(csv_name)
+            return completed
         else:
             print("Invalid import type, shouldn't ever get to this code, quitting program.")
             return False
@@ -1148,6 +2235,165 @@ def main_import(test=True):
         print("Invalid import type, quitting program.")
         return False
 
+def list_import_files(folder_name:str='./to-import') -> List[Tuple[str,Optional[Tuple[str]]]]:
+    """List the CSV and XLSX files in the import folder with the details parsed from their names.
+
+    XLSX files are parsed as if they had a .csv extension, and are left out if the CSV
+    they would be converted to is already in the folder.
+
+    Returns:
+        List[Tuple[str,Optional[Tuple[str]]]]: (file path, (grad_year, test_type, test_date, form) or None)
+    """
+    files = sorted(list_files(folder_name))
+    import_files = []
+    for file_name in files:
+        stem, ext = os.path.splitext(file_name)
+        if ext.lower() not in ('.csv','.xlsx'):
+            continue
+        if ext.lower() == '.xlsx' and f"{stem}.csv" in files:
+            continue
+        try:
+            details = parse_standard_filename(f"{stem}.csv")
+        except ValueError:
+            details = None
+        import_files.append((os.path.join(folder_name,file_name),details))
+    return import_files
+
+def batch_import_grades(test=True,batch=False,schema_cache_path=None,record_cache_path=None,folder_name='./to-import',upsert=False,journal_path=None,manifest_path=IMPORT_MANIFEST_PATH,reimport=False,match_dup_on_date=False):
+    """Import the grades in every CSV/XLSX file in the import folder without prompts.
+
+    Files must use the standard file name so the grad class, test type, date and form
+    can be read from it. Files are grouped by grad class so each class's students are
+    fetched once, and all files are parsed across processes before any are imported.
+    Duplicates are checked for every grade: new grades are created and existing ones
+    left as they are. With upsert, grades are instead created or updated by their
+    GRADE_KEY_FIELD without reading Test Scores first.
+
+    Files the manifest shows were imported before are skipped (unless reimport is set)
+    and moved to the archive folder, as are the files imported now.
+
+    Returns:
+        bool: True if every file with a standard name was imported, False otherwise
+    """
+    if not os.path.isdir(folder_name):
+        print(f"The directory '{folder_name}' does not exist.")
+        return False
+
+    import_files = list_import_files(folder_name)
+    if not import_files:
+        print(f"No CSV or XLSX files found in the directory '{folder_name}'.")
+        return False
+
+    # group files by grad class, leaving out files imported before
+    manifest = ImportManifest(manifest_path) if manifest_path else None
+    files_by_class = {}
+    summary = []
+    restart_times = {} # when files imported before were, so they start afresh in the journal
+    for file_path, details in import_files:
+        if details is None:
+            summary.append((file_path,'skipped - file name not in the standard format',None))
+            continue
+        entry = manifest.find(file_path,'grades') if manifest is not None else None
+        if entry is not None:
+            restart_times[file_path] = manifest.imported_time(file_path,'grades')
+        if entry is not None and not reimport:
+            summary.append((file_path,f"skipped - {already_imported_message(entry)}",None))
+            if not test:
+                archive_import_file(file_path)
+            continue
+        if manifest is not None:
+            for other in manifest.find_exam(file_path,details,'grades'):
+                log.warning(f"{os.path.basename(file_path)} is for the same exam as {other['file_name']}, which was imported on {other['imported_at']}.")
+        files_by_class.setdefault(details[0],[]).append((file_path,details))
+
+    # parse every file across processes before importing, writing XLSX files to CSV as they're read
+    file_paths = [file_path for class_files in files_by_class.values() for file_path, _ in class_files]
+    csv_paths = [
+        os.path.splitext(file_path)[0] + '.csv' if file_path.lower().endswith('.xlsx') else None
+        for file_path in file_paths
+    ]
+    parsed_files = {}
+    for file_path, import_list, error in read_import_files(file_paths,csv_paths=csv_paths):
+        parsed_files[file_path] = (import_list,error)
+
+    b = initialize_airtable()
+    students_table = b.table('Students')
+    grades_table = b.table('Test Scores')
+    schema_cache = SchemaCache(b,schema_cache_path)
+    record_cache = RecordCache(record_cache_path) if record_cache_path else None
+    grad_yr_options = schema_cache.field_options(students_table.name,'Grad Class')
+    student_import_fields = ['ID','First name','Last name','Grad Class','Zeraki ADM No','KCPE Score']
+    if upsert and not grade_key_field_exists(schema_cache,grades_table):
+        return False
+
+    try:
+        for grad_year, class_files in files_by_class.items():
+            if grad_year not in grad_yr_options:
+                for file_path, _ in class_files:
+                    summary.append((file_path,f'skipped - {grad_year} is not a Grad Class in Airtable',None))
+                continue
+            log.info(f"Fetching students in the class of {grad_year}...")
+            student_records, grad_year = get_students_from_grad_year(student_import_fields,students_table,grad_year,schema_cache,record_cache)
+
+            for file_path, (_, test_type, test_date, form) in class_files:
+                import_list, error = parsed_files[file_path]
+                if error is not None:
+                    log.error(f"Unable to parse {file_path}: {error}")
+                    summary.append((file_path,f'failed - {error}',None))
+                    continue
+                log.info(f"""
+========
+Importing {test_type} grades from {file_path}...
+""")
+                try:
+                    for rec in import_list:
+                        rec.add_test_type(test_type,form,test_date,grad_year)
+                    journal = None
+                    if journal_path and not test and import_list:
+                        journal = ImportJournal(journal_path,file_path,grade_import_key(import_list[0]),restart_times.get(file_path))
+                    *counts, completed = import_grades(import_list,student_records,grades_table,test,match_dup_on_date,batch=batch,record_cache=record_cache,auto_approve=True,upsert=upsert,journal=journal)
+                    if not completed:
+                        # left in to-import, so the next run retries the failed writes
+                        summary.append((file_path,'incomplete - some grade writes failed',counts))
+                    else:
+                        summary.append((file_path,'imported',counts))
+                    if not test and completed:
+                        if manifest is not None:
+                            manifest.record(file_path,'grades',(grad_year,test_type,test_date,form),counts)
+                        archive_import_file(file_path)
+                        if file_path.lower().endswith('.xlsx'):
+                            archive_import_file(os.path.splitext(file_path)[0] + '.csv')
+                except (ValueError,KeyError,IndexError,HTTPError) as e:
+                    log.error(f"Unable to import {file_path}: {e}")
+                    summary.append((file_path,f'failed - {e}',None))
+                if record_cache is not None and not test:
+                    record_cache.invalidate(grades_table)
+    finally:
+        # grades may have been written, so fetch them fresh next time
+        if record_cache is not None and not test:
+            record_cache.invalidate(grades_table)
+
+    print_batch_import_summary(summary)
+    remind_if_test_mode(test,False)
+    return all(outcome == 'imported' or outcome.startswith('skipped - already imported') for _, outcome, _ in summary)
+
+def print_batch_import_summary(summary:List[Tuple[str,str,Optional[Tuple[int]]]]):
+    total_grades = 0
+    total_students = 0
+    print("")
+    print("Batch import summary:")
+    for file_path, outcome, counts in summary:
+        if counts is None:
+            print(f"    {os.path.basename(file_path)}: {outcome}")
+        else:
+            grades, matched, unmatched = counts
+            total_grades += grades
+            total_students += matched
+            note = '' if outcome == 'imported' else f" ({outcome})"
+            print(f"    {os.path.basename(file_path)}: {grades} grades imported for {matched} students, {unmatched} students not matched{note}")
+    imported_files = len([s for s in summary if s[2] is not None])
+    print(f"{total_grades} grades imported for {total_students} students from {imported_files} of {len(summary)} files.")
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Choose a function to run")
     parser.add_argument(
@@ -1156,16 +2402,90 @@ def parse_args():
         default="test",
         help="Specify which function to run: 'test','real'"
     )
+    parser.add_argument(
+        "-b","--batch",
+        action="store_true",
+        help="Queue Airtable writes and send them 10 records per request"
+    )
+    parser.add_argument(
+        "-s","--schema-cache",
+        nargs="?",
+        const=".schema-cache.json",
+        default=None,
+        help="Save the Airtable schema to this file and reuse it for a day (default file: .schema-cache.json)"
+    )
+    parser.add_argument(
+        "-c","--cache",
+        nargs="?",
+        const=".airtable-cache.db",
+        default=None,
+        help="Keep fetched Students and Test Scores in this file and reuse them for an hour (default file: .airtable-cache.db)"
+    )
+    parser.add_argument(
+        "-a","--all-files",
+        action="store_true",
+        help="Import the grades in every file in the to-import folder without prompts"
+    )
+    parser.add_argument(
+        "-u","--upsert",
+        action="store_true",
+        help=f"Create or update grades by their '{GRADE_KEY_FIELD}' without checking Test Scores for duplicates first"
+    )
+    parser.add_argument(
+        "--dup-on-date",
+        action="store_true",
+        help="Only treat an existing grade as a duplicate if its Date of Score matches too, e.g. when a class sat the same exam twice in a form"
+    )
+    parser.add_argument(
+        "-j","--journal",
+        default=".import-journal.db",
+        help="Journal each row's outcome in this file, so rerunning a file after quitting or a crash skips the rows already imported (default file: .import-journal.db)"
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="Import every row, without reading or writing the journal"
+    )
+    parser.add_argument(
+        "--reimport",
+        action="store_true",
+        help="With -a, import files the import manifest shows were imported before"
+    )
+    parser.add_argument(
+        "-v","--verbose",
+        action="store_true",
+        help="Show every grade parsed from the CSV"
+    )
+    parser.add_argument(
+        "-q","--quiet",
+        action="store_true",
+        help="Only show prompts, warnings and errors, with a progress bar while importing grades"
+    )
+    parser.add_argument(
+        "--log-file",
+        default=None,
+        help="Append every log message to this file as JSON lines"
+    )
     return parser.parse_args()
 
 def main():
     args = parse_args()
+    configure_logging(verbose=args.verbose,quiet=args.quiet,log_file=args.log_file)
+
+    journal_path = None if args.no_journal else args.journal
 
     # Run the appropriate function based on the argument
-    if args.function == "test":
-        main_import(test=True)
-    else:
-        main_import(test=False)
+    try:
+        if args.all_files:
+            batch_import_grades(test=(args.function == "test"),batch=args.batch,schema_cache_path=args.schema_cache,record_cache_path=args.cache,upsert=args.upsert,journal_path=journal_path,reimport=args.reimport,match_dup_on_date=args.dup_on_date)
+        elif args.function == "test":
+            main_import(test=True,batch=args.batch,schema_cache_path=args.schema_cache,record_cache_path=args.cache,upsert=args.upsert,journal_path=journal_path,match_dup_on_date=args.dup_on_date)
+        else:
+            main_import(test=False,batch=args.batch,schema_cache_path=args.schema_cache,record_cache_path=args.cache,upsert=args.upsert,journal_path=journal_path,match_dup_on_date=args.dup_on_date)
+    finally:
+        # report Airtable requests made, retried and rate limited
+        for summary in airtable_client.summaries():
+            log.info(summary)
 
 if __name__ == "__main__":
     main()
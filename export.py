@@ -1,13 +1,56 @@
+import argparse
 import click
 import httpx
 from httpx import HTTPError
 import os
 import json as json_
+import gzip
 import pathlib
 from urllib.parse import quote, urlencode
 import time
+from datetime import datetime, timedelta, timezone
+import threading
+import sqlite3
+import sqlite_utils
+from concurrent.futures import ThreadPoolExecutor
+from logs import log, configure_logging, progress
+import airtable_client
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export the KGSA Airtable base to JSON files")
+    parser.add_argument(
+        "--sqlite",
+        nargs="?",
+        const=".export/kgsa.db",
+        default=None,
+        help="Also load every table into this SQLite database (default file: .export/kgsa.db)"
+    )
+    parser.add_argument(
+        "-i","--incremental",
+        action="store_true",
+        help="Only fetch records modified since the last export and merge them into the existing files"
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Discard checkpoints left by an interrupted export and fetch every table again"
+    )
+    parser.add_argument(
+        "-q","--quiet",
+        action="store_true",
+        help="Only show warnings and errors, with a progress bar as tables finish"
+    )
+    parser.add_argument(
+        "--log-file",
+        default=None,
+        help="Append every log message to this file as JSON lines"
+    )
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    configure_logging(quiet=args.quiet,log_file=args.log_file)
+
     # ============ Base ID ============
     output_path = '.export/'
 
@@ -24,7 +67,254 @@ def main():
     access_key = str(access_key)
     access_key = access_key.strip()
 
-    export(output_path=output_path,base_id=base_id,key=access_key)
+    # ============ Output Format ============
+    # "json" for one JSON array per table, "jsonl" for one record per line
+    output_format = "json"
+    compress = False
+
+    # ============ Concurrency ============
+    # tables fetched at once, all sharing one token bucket for Airtable's limit of 5 requests per second per base
+    max_workers = 4
+    requests_per_second = 5
+
+    # ============ Connection Pool ============
+    # one client is shared by every request, keeping connections open between pages and tables
+    max_connections = max_workers
+    http2 = True # used if the h2 package is installed
+
+    export(output_path=output_path,base_id=base_id,key=access_key,max_workers=max_workers,requests_per_second=requests_per_second,output_format=output_format,compress=compress,sqlite_path=args.sqlite,incremental=args.incremental,restart=args.restart,max_connections=max_connections,http2=http2)
+
+class RecordWriter:
+    """Write records to disk as they arrive rather than holding a whole table in memory.
+
+    "json" writes the same indented JSON array json.dumps(records, indent=4) would,
+    "jsonl" writes one compact record per line. compress=True gzips the file.
+    """
+    def __init__(self, path, output_format="json", compress=False):
+        if output_format not in ("json", "jsonl"):
+            raise ValueError(f"Unknown export format: {output_format}")
+        self.path = path
+        self.output_format = output_format
+        if compress:
+            self.file = gzip.open(path, "wt", encoding="utf-8")
+        else:
+            self.file = open(path, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, record):
+        if self.output_format == "jsonl":
+            self.file.write(json_.dumps(record, sort_keys=True) + "\n")
+        else:
+            dumped = json_.dumps(record, sort_keys=True, indent=4)
+            self.file.write(("[\n" if self.count == 0 else ",\n") + "    " + dumped.replace("\n", "\n    "))
+        self.count += 1
+
+    def close(self):
+        if self.output_format == "json":
+            self.file.write("\n]" if self.count else "[]")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SqliteSink:
+    """Load exported batches into a local SQLite database, one table per Airtable table.
+
+    Columns are typed from the base schema and linked record fields are indexed.
+    Lists and dicts (links, multiple selects, attachments) are stored as JSON text.
+    Tables are recreated on every full export so the database mirrors the base.
+    Incremental exports keep the existing tables and upsert the changed records.
+    """
+    INTEGER_TYPES = ("autoNumber", "count", "checkbox", "rating")
+    FLOAT_TYPES = ("number", "currency", "percent", "duration")
+
+    def __init__(self, path, schema_data, incremental=False):
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # batches arrive from the export threads, so share one connection behind a lock
+        self.db = sqlite_utils.Database(sqlite3.connect(path, check_same_thread=False))
+        self.lock = threading.Lock()
+        self.link_fields = {}
+        for table in schema_data["tables"]:
+            columns = {"airtable_id": str}
+            for field in table["fields"]:
+                columns[field["name"]] = self.column_type(field)
+            columns["airtable_createdTime"] = str
+            if incremental:
+                self.db[table["name"]].create(columns, pk="airtable_id", if_not_exists=True)
+            else:
+                self.db[table["name"]].create(columns, pk="airtable_id", replace=True)
+            self.link_fields[table["name"]] = [
+                field["name"] for field in table["fields"]
+                if field["type"] == "multipleRecordLinks"
+            ]
+
+    def column_type(self, field):
+        if field["type"] in self.INTEGER_TYPES:
+            return int
+        if field["type"] in self.FLOAT_TYPES:
+            if field["type"] == "number" and field.get("options", {}).get("precision") == 0:
+                return int
+            return float
+        return str
+
+    def write_batch(self, table, batch):
+        if not batch:
+            return
+        with self.lock:
+            self.db[table].insert_all(batch, pk="airtable_id", replace=True, alter=True)
+
+    def delete_records(self, table, record_ids):
+        if not record_ids:
+            return
+        with self.lock:
+            with self.db.conn:
+                for record_id in record_ids:
+                    self.db[table].delete_where("airtable_id = ?", [record_id])
+
+    def create_indexes(self):
+        with self.lock:
+            for table, fields in self.link_fields.items():
+                for field in fields:
+                    self.db[table].create_index([field], if_not_exists=True)
+
+    def close(self):
+        self.create_indexes()
+        self.db.conn.close()
+
+
+def export_filename(table, output_format="json", compress=False):
+    return "{}.{}{}".format(table, output_format, ".gz" if compress else "")
+
+
+def read_export(path, output_format="json", compress=False):
+    "Read back the records of a table written by RecordWriter"
+    opener = gzip.open if compress else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        if output_format == "jsonl":
+            return [json_.loads(line) for line in file if line.strip()]
+        return json_.load(file)
+
+
+def iter_export(path, output_format="json", compress=False):
+    "Read back the records of a table written by RecordWriter one at a time, without loading the file"
+    opener = gzip.open if compress else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        if output_format == "jsonl":
+            for line in file:
+                if line.strip():
+                    yield json_.loads(line)
+            return
+        # each record of the indented array starts at "    {" and ends at "    }", nested values are indented further
+        lines = []
+        for line in file:
+            if line.startswith("    {") or lines:
+                lines.append(line)
+            if lines and line.rstrip().rstrip(",") in ("    }", "    {}"):
+                yield json_.loads("".join(lines).rstrip().rstrip(","))
+                lines = []
+
+
+def high_water_mark(margin=timedelta(minutes=5)):
+    "Timestamp to fetch changes from next time, taken before fetching and set back to allow for clock skew"
+    return (datetime.now(timezone.utc) - margin).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def load_export_state(output):
+    try:
+        return json_.loads((output / "_state.json").read_text("utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_export_state(output, state):
+    (output / "_state.json").write_text(json_.dumps(state, sort_keys=True, indent=4), "utf-8")
+
+
+class TableCheckpoint:
+    """Progress of one table's export, saved after every page so an interrupted export can resume.
+
+    Fetched records are appended to a JSON lines .partial file beside the checkpoint, which
+    records the next pagination offset and the size of the partial file at that point.
+    Checkpoints left by an export with other settings are ignored.
+    """
+    def __init__(self, output, table, settings):
+        directory = output / "_checkpoints"
+        directory.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.path = directory / (table + ".json")
+        self.partial_path = directory / (table + ".partial")
+        self.settings = settings
+        try:
+            self.state = json_.loads(self.path.read_text("utf-8"))
+        except (OSError, ValueError):
+            self.state = {}
+        if self.state.get("settings") != settings:
+            self.restart()
+
+    @property
+    def done(self):
+        return self.state["done"]
+
+    @property
+    def resumed(self):
+        return self.state["records"] > 0 or self.state["fetched"]
+
+    def restart(self, mark=None):
+        self.state = {
+            "settings": self.settings, "mark": mark, "offset": None, "records": 0,
+            "size": 0, "fetched": False, "done": False
+        }
+        self.partial_path.unlink(missing_ok=True)
+        self.save()
+
+    def start(self, mark):
+        "The saved offset to resume from, truncating anything written after the last save"
+        if self.state["mark"] is None:
+            self.state["mark"] = mark
+            self.save()
+        with open(self.partial_path, "ab") as file:
+            file.truncate(self.state["size"])
+        return self.state["offset"]
+
+    def append(self, records, offset):
+        with open(self.partial_path, "a", encoding="utf-8") as file:
+            for r in records:
+                file.write(json_.dumps(r, sort_keys=True) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+            size = file.tell()
+        self.state.update(offset=offset, records=self.state["records"] + len(records), size=size, fetched=offset is None)
+        self.save()
+
+    def records_fetched(self):
+        with open(self.partial_path, encoding="utf-8") as file:
+            for line in file:
+                yield json_.loads(line)
+
+    def finish(self, mark, records=None):
+        if records is not None:
+            self.state["records"] = records
+        self.state.update(mark=mark, done=True)
+        self.save()
+        self.partial_path.unlink(missing_ok=True)
+
+    def save(self):
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        temp_path.write_text(json_.dumps(self.state, sort_keys=True, indent=4), "utf-8")
+        os.replace(temp_path, self.path)
+
+
+def clear_checkpoints(output):
+    directory = output / "_checkpoints"
+    if directory.exists():
+        for path in directory.iterdir():
+            path.unlink()
+        directory.rmdir()
+
 
 def export(
     output_path,
@@ -32,79 +322,389 @@ def export(
     key,
     http_read_timeout=True,
     user_agent=None,
-    verbose=True
+    verbose=True,
+    max_workers=4,
+    requests_per_second=5,
+    output_format="json",
+    compress=False,
+    sqlite_path=None,
+    incremental=False,
+    restart=False,
+    max_connections=4,
+    http2=True
 ):
-    "Export Airtable data to YAML file on disk"
+    """Export Airtable data to YAML file on disk
+
+    Tables finished by an earlier, interrupted export with the same settings are not
+    fetched again, and a partly fetched table resumes from its last page.
+    """
     output = pathlib.Path(output_path)
     output.mkdir(parents=True, exist_ok=True)
-    write_batch = lambda table, batch: None
-    schema_data = list_tables(base_id, key, user_agent=user_agent)
+    if restart:
+        clear_checkpoints(output)
+    state = load_export_state(output)
+    # changes since a mark only make sense against files written in the same format
+    if state.get("format") != [output_format, compress]:
+        state = {}
+    sqlite_file = str(pathlib.Path(sqlite_path).resolve()) if sqlite_path else None
+    if incremental and sqlite_file and (state.get("sqlite") != sqlite_file or not pathlib.Path(sqlite_file).exists()):
+        # the database would only get the changes, so fill it from a full export instead
+        log.warning(f"{sqlite_path} wasn't loaded by the last export, so every table is exported in full")
+        incremental = False
+    marks = state.get("tables", {}) if incremental else {}
+    throttle = airtable_client.throttle_for(base_id, requests_per_second=requests_per_second)
+    with make_client(key, http_read_timeout, user_agent, max_connections, http2) as client:
+        export_tables(
+            output, base_id, key, client, throttle, marks,
+            http_read_timeout=http_read_timeout, user_agent=user_agent, verbose=verbose,
+            max_workers=max_workers, output_format=output_format, compress=compress,
+            sqlite_path=sqlite_path, incremental=incremental
+        )
+    if verbose:
+        log.info(throttle.summary())
+
+
+def export_tables(
+    output,
+    base_id,
+    key,
+    client,
+    throttle,
+    marks,
+    http_read_timeout=True,
+    user_agent=None,
+    verbose=True,
+    max_workers=4,
+    output_format="json",
+    compress=False,
+    sqlite_path=None,
+    incremental=False
+):
+    "Export the schema and every table of a base, sharing one client and throttle"
+    schema_data = list_tables(base_id, key, user_agent=user_agent, throttle=throttle, client=client)
     dumped_schema = json_.dumps(schema_data, sort_keys=True, indent=4)
     (output / "_schema.json").write_text(dumped_schema, "utf-8")
     tables = [table["name"] for table in schema_data["tables"]]
+    primary_fields = {table["name"]: table["primaryFieldId"] for table in schema_data["tables"]}
+    sink = SqliteSink(sqlite_path, schema_data, incremental) if sqlite_path else None
+    write_batch = sink.write_batch if sink else None
+    delete_records = sink.delete_records if sink else None
+    settings = [output_format, compress, incremental]
+    checkpoints = {table: TableCheckpoint(output, table, settings) for table in tables}
 
-    for table in tables:
-        records = []
-        try:
-            db_batch = []
-            for record in all_records(
-                base_id, table, key, http_read_timeout, user_agent=user_agent
-            ):
-                r = {
-                    **{"airtable_id": record["id"]},
-                    **record["fields"],
-                    **{"airtable_createdTime": record["createdTime"]},
-                }
-                records.append(r)
-                db_batch.append(r)
-                if len(db_batch) == 100:
-                    write_batch(table, db_batch)
-                    db_batch = []
-        except HTTPError as exc:
-            raise click.ClickException(exc)
-        write_batch(table, db_batch)
-        filenames = []
-        filename = "{}.json".format(table)
-        dumped = json_.dumps(records, sort_keys=True, indent=4)
-        (output / filename).write_text(dumped, "utf-8")
-        filenames.append(output / filename)
+    # the pool waits for the other tables to finish (and checkpoint) before the sink is closed
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(
+                    export_table, output, base_id, table, key, http_read_timeout,
+                    user_agent=user_agent, verbose=verbose, throttle=throttle,
+                    output_format=output_format, compress=compress, write_batch=write_batch,
+                    modified_since=marks.get(table), primary_field_id=primary_fields[table],
+                    delete_records=delete_records, client=client, checkpoint=checkpoints[table]
+                )
+                for table in tables
+            ]
+            # results in table order, so the first failed table raises its ClickException
+            new_marks = {
+                table: future.result()
+                for table, future in progress(list(zip(tables, futures)), "Exporting tables")
+            }
+    finally:
+        if sink:
+            sink.close()
+    # remember which database the tables were loaded into, so -i only upserts into a complete one
+    sqlite_file = str(pathlib.Path(sqlite_path).resolve()) if sqlite_path else None
+    save_export_state(output, {"format": [output_format, compress], "tables": new_marks, "sqlite": sqlite_file})
+    clear_checkpoints(output)
+    if sink and verbose:
+        log.info(f"Loaded {len(tables)} table(s) into {sqlite_path}")
+
+
+def export_table(
+    output,
+    base_id,
+    table,
+    key,
+    http_read_timeout=True,
+    user_agent=None,
+    verbose=True,
+    throttle=None,
+    output_format="json",
+    compress=False,
+    write_batch=None,
+    modified_since=None,
+    primary_field_id=None,
+    delete_records=None,
+    client=None,
+    checkpoint=None
+):
+    """Export one Airtable table to a file in the output directory, writing each page as it arrives.
+
+    If modified_since is given and the table was exported before, only records modified
+    since then are fetched and merged into the existing file. Returns the mark to pass
+    as modified_since next time.
+
+    With a TableCheckpoint, pages are saved to the checkpoint as they arrive and the export
+    file is written once the table is complete, so an interrupted export can resume.
+    """
+    loading = write_batch is not None
+    if write_batch is None:
+        write_batch = lambda table, batch: None
+    mark = high_water_mark()
+    filenames = []
+    filename = export_filename(table, output_format, compress)
+    if checkpoint is not None and checkpoint.done:
+        # finished before the export was interrupted: only reload it into the database, 100 records at a time
+        count = checkpoint.state["records"]
+        if loading:
+            batch = []
+            for record in iter_export(output / filename, output_format, compress):
+                batch.append(record)
+                if len(batch) == 100:
+                    write_batch(table, batch)
+                    batch = []
+            write_batch(table, batch)
         if verbose:
-            files = ", ".join(map(str, filenames))
-            print(f"Wrote {len(records)} record(s) to {files}")
+            log.info(f"{table}: already exported ({count} record(s))")
+        return checkpoint.state["mark"]
+    if modified_since is not None and (output / filename).exists():
+        count = export_table_changes(
+            output, base_id, table, key, modified_since, primary_field_id, http_read_timeout,
+            user_agent=user_agent, verbose=verbose, throttle=throttle,
+            output_format=output_format, compress=compress, write_batch=write_batch,
+            delete_records=delete_records, client=client
+        )
+        if checkpoint is not None:
+            checkpoint.finish(mark, count)
+    elif checkpoint is not None:
+        mark = export_table_checkpointed(
+            output, base_id, table, key, checkpoint, mark, http_read_timeout,
+            user_agent=user_agent, verbose=verbose, throttle=throttle,
+            output_format=output_format, compress=compress, write_batch=write_batch, client=client
+        )
+        count = checkpoint.state["records"]
+    else:
+        with RecordWriter(output / filename, output_format, compress) as writer:
+            try:
+                db_batch = []
+                for record in all_records(
+                    base_id, table, key, http_read_timeout, user_agent=user_agent,
+                    throttle=throttle, client=client
+                ):
+                    r = export_record(record)
+                    writer.write(r)
+                    db_batch.append(r)
+                    if len(db_batch) == 100:
+                        write_batch(table, db_batch)
+                        db_batch = []
+            except HTTPError as exc:
+                raise click.ClickException(exc)
+            write_batch(table, db_batch)
+        count = writer.count
+    filenames.append(output / filename)
+    if verbose:
+        files = ", ".join(map(str, filenames))
+        log.info(f"Wrote {count} record(s) to {files}", extra={"data": {"table": table, "records": count}})
+    return mark
 
 
-def list_tables(base_id, api_key, user_agent=None):
+def export_table_checkpointed(
+    output,
+    base_id,
+    table,
+    key,
+    checkpoint,
+    mark,
+    http_read_timeout=True,
+    user_agent=None,
+    verbose=True,
+    throttle=None,
+    output_format="json",
+    compress=False,
+    write_batch=None,
+    client=None
+):
+    "Fetch a table into its checkpoint, resuming if it was interrupted, then write its export file"
+    def fetch(offset):
+        for records, next_offset in record_pages(
+            base_id, table, key, http_read_timeout, user_agent=user_agent,
+            throttle=throttle, client=client, offset=offset
+        ):
+            checkpoint.append([export_record(record) for record in records], next_offset)
+
+    offset = checkpoint.start(mark)
+    resumed = checkpoint.resumed
+    if resumed and verbose:
+        log.info(f"{table}: resuming after {checkpoint.state['records']} record(s)")
+    try:
+        if not checkpoint.state["fetched"]:
+            try:
+                fetch(offset)
+            except httpx.HTTPStatusError as exc:
+                # Airtable expires pagination offsets after a while, so start the table again
+                if not (resumed and exc.response.status_code == 422):
+                    raise
+                log.warning(f"{table}: saved position has expired, fetching the table again")
+                checkpoint.restart(mark)
+                fetch(None)
+    except HTTPError as exc:
+        raise click.ClickException(exc)
+
+    db_batch = []
+    with RecordWriter(output / export_filename(table, output_format, compress), output_format, compress) as writer:
+        for r in checkpoint.records_fetched():
+            writer.write(r)
+            db_batch.append(r)
+            if len(db_batch) == 100:
+                write_batch(table, db_batch)
+                db_batch = []
+        write_batch(table, db_batch)
+    checkpoint.finish(checkpoint.state["mark"])
+    return checkpoint.state["mark"]
+
+
+def export_table_changes(
+    output,
+    base_id,
+    table,
+    key,
+    modified_since,
+    primary_field_id,
+    http_read_timeout=True,
+    user_agent=None,
+    verbose=True,
+    throttle=None,
+    output_format="json",
+    compress=False,
+    write_batch=None,
+    delete_records=None,
+    client=None
+):
+    "Merge records changed since modified_since into a table's existing export file"
+    formula = f"IS_AFTER(LAST_MODIFIED_TIME(), '{modified_since}')"
+    try:
+        changed = {}
+        for record in all_records(
+            base_id, table, key, http_read_timeout, user_agent=user_agent,
+            throttle=throttle, params={"filterByFormula": formula}, client=client
+        ):
+            changed[record["id"]] = export_record(record)
+        # fetch only the primary field of every record to find deletions
+        current_ids = set(
+            record["id"] for record in all_records(
+                base_id, table, key, http_read_timeout, user_agent=user_agent,
+                throttle=throttle, params={"fields[]": primary_field_id}, client=client
+            )
+        )
+    except HTTPError as exc:
+        raise click.ClickException(exc)
+
+    changed_batch = list(changed.values())
+    for start in range(0, len(changed_batch), 100):
+        write_batch(table, changed_batch[start:start + 100])
+
+    path = output / export_filename(table, output_format, compress)
+    existing = read_export(path, output_format, compress)
+    deleted = [r["airtable_id"] for r in existing if r["airtable_id"] not in current_ids]
+    if delete_records is not None:
+        delete_records(table, deleted)
+
+    # keep the existing order, replacing changed records and adding new ones at the end
+    temp_path = path.with_name(path.name + ".tmp")
+    with RecordWriter(temp_path, output_format, compress) as writer:
+        for r in existing:
+            if r["airtable_id"] in current_ids:
+                writer.write(changed.pop(r["airtable_id"], r))
+        for r in changed.values():
+            if r["airtable_id"] in current_ids:
+                writer.write(r)
+    os.replace(temp_path, path)
+    if verbose:
+        log.info(f"{table}: {len(changed_batch)} changed and {len(deleted)} deleted record(s) since {modified_since}")
+    return writer.count
+
+
+def export_record(record):
+    return {
+        **{"airtable_id": record["id"]},
+        **record["fields"],
+        **{"airtable_createdTime": record["createdTime"]},
+    }
+
+
+def make_client(api_key, http_read_timeout=True, user_agent=None, max_connections=4, http2=True):
+    "One pooled, keep-alive client for every request of an export"
+    headers = {"Authorization": "Bearer {}".format(api_key)}
+    if user_agent is not None:
+        headers["user-agent"] = user_agent
+    if http_read_timeout:
+        timeout = httpx.Timeout(5, read=http_read_timeout)
+    else:
+        timeout = httpx.Timeout(5)
+    if http2:
+        try:
+            import h2  # noqa: F401 - httpx needs it for HTTP/2
+        except ImportError:
+            http2 = False
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.Client(headers=headers, timeout=timeout, limits=limits, http2=http2)
+
+
+def list_tables(base_id, api_key, user_agent=None, throttle=None, client=None):
     url = f"https://api.airtable.com/v0/meta/bases/{base_id}/tables"
     headers = {"Authorization": "Bearer {}".format(api_key)}
     if user_agent is not None:
         headers["user-agent"] = user_agent
-    return httpx.get(url, headers=headers).json()
+    if client is None:
+        client = httpx
+    if throttle is not None:
+        response = throttle.send(lambda: client.get(url, headers=headers), "GET")
+    else:
+        response = client.get(url, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+def all_records(base_id, table, api_key, http_read_timeout, sleep=0.2, user_agent=None, throttle=None, params=None, client=None):
+    for records, _ in record_pages(
+        base_id, table, api_key, http_read_timeout, sleep=sleep, user_agent=user_agent,
+        throttle=throttle, params=params, client=client
+    ):
+        yield from records
 
 
-def all_records(base_id, table, api_key, http_read_timeout, sleep=0.2, user_agent=None):
+def record_pages(base_id, table, api_key, http_read_timeout, sleep=0.2, user_agent=None, throttle=None, params=None, client=None, offset=None):
+    "Yield each page of records with the offset of the next page, None after the last"
     headers = {"Authorization": "Bearer {}".format(api_key)}
     if user_agent is not None:
         headers["user-agent"] = user_agent
 
-    if http_read_timeout:
+    # without a shared client (see make_client) every call opens its own connections
+    if client is None and http_read_timeout:
         timeout = httpx.Timeout(5, read=http_read_timeout)
         client = httpx.Client(timeout=timeout)
-    else:
+    elif client is None:
         client = httpx
 
     first = True
-    offset = None
     while first or offset:
         first = False
         url = "https://api.airtable.com/v0/{}/{}".format(base_id, quote(table, safe=""))
+        query = dict(params or {})
         if offset:
-            url += "?" + urlencode({"offset": offset})
-        response = client.get(url, headers=headers)
+            query["offset"] = offset
+        if query:
+            url += "?" + urlencode(query)
+        if throttle is not None:
+            response = throttle.send(lambda: client.get(url, headers=headers), "GET")
+        else:
+            response = client.get(url, headers=headers)
         response.raise_for_status()
         data = response.json()
         offset = data.get("offset")
-        yield from data["records"]
-        if offset and sleep:
+        yield data["records"], offset
+        if offset and sleep and throttle is None:
             time.sleep(sleep)
 
 
@@ -0,0 +1,212 @@
+import argparse
+import pathlib
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from tabulate import tabulate
+from export import export_filename, load_export_state, read_export
+from logs import log, configure_logging
+
+# Columnar store of the Test Scores written by export.py, for reports over years of grades
+#   each categorical column is an array of integer codes into a sorted list of labels,
+#   so group-bys are done with NumPy over whole columns instead of looping over records
+
+GRADES_TABLE = 'Test Scores'
+STUDENTS_TABLE = 'Students'
+
+class GradeStore:
+    """Test Scores held column by column in NumPy arrays.
+
+    Student, grad class, subject, form, score type, date and letter score are stored as
+    codes into self.labels[column], and numeric scores as floats (NaN if there is none).
+    Dates are ISO strings, so their codes sort in date order.
+    """
+    CATEGORIES = ('student','grad_class','subject','form','score_type','date','letter')
+
+    def __init__(self,codes:Dict[str,np.ndarray],labels:Dict[str,List[str]],scores:np.ndarray,kcpe:Dict[str,float],student_names:Dict[str,str]):
+        self.codes = codes
+        self.labels = labels
+        self.scores = scores
+        self.kcpe = kcpe
+        self.student_names = student_names
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @classmethod
+    def from_export(cls,export_path:str='.export/',output_format:Optional[str]=None,compress:Optional[bool]=None) -> 'GradeStore':
+        """Load the Test Scores and Students tables written by export.py.
+
+        Args:
+            export_path (str): folder export.py wrote to
+            output_format (str): "json" or "jsonl", read from the export's _state.json if not given
+            compress (bool): whether the files are gzipped, read from _state.json if not given
+        """
+        output = pathlib.Path(export_path)
+        state_format = load_export_state(output).get('format') or ['json',False]
+        if output_format is None:
+            output_format = state_format[0]
+        if compress is None:
+            compress = state_format[1]
+        grades = read_export(output / export_filename(GRADES_TABLE,output_format,compress),output_format,compress)
+        students = read_export(output / export_filename(STUDENTS_TABLE,output_format,compress),output_format,compress)
+        return cls.from_records(grades,students)
+
+    @classmethod
+    def from_records(cls,grades:List[dict],students:List[dict]) -> 'GradeStore':
+        "Build the store from exported records, as written by export.export_record"
+        grad_classes = {student['airtable_id']: student.get('Grad Class') for student in students}
+        kcpe = {
+            student['airtable_id']: float(student['KCPE Score']) for student in students
+            if isinstance(student.get('KCPE Score'),(int,float))
+        }
+        student_names = {
+            student['airtable_id']: f"{student.get('ID')} - {student.get('First name','')} {student.get('Last name','')}".strip()
+            for student in students
+        }
+
+        raw = {category: [] for category in cls.CATEGORIES}
+        scores = []
+        for grade in grades:
+            linked = grade.get('Student ID') or [None]
+            student = linked[0]
+            raw['student'].append(student)
+            raw['grad_class'].append(grad_classes.get(student))
+            raw['subject'].append(grade.get('Subject'))
+            raw['form'].append(grade.get('Form'))
+            raw['score_type'].append(grade.get('Score Type'))
+            raw['date'].append(grade.get('Date of Score'))
+            raw['letter'].append(grade.get('Letter Score'))
+            score = grade.get('Numeric Score')
+            scores.append(score if isinstance(score,(int,float)) else np.nan)
+
+        codes = {}
+        labels = {}
+        for category, values in raw.items():
+            # missing values sort as '' so every column can be encoded the same way
+            column = np.array(['' if value is None else str(value) for value in values],dtype=object)
+            uniques, inverse = np.unique(column,return_inverse=True)
+            labels[category] = list(uniques)
+            codes[category] = inverse.astype(np.int32)
+        log.info(f"Loaded {len(scores)} grade(s) for {len(labels['student'])} student(s).")
+        return cls(codes,labels,np.array(scores,dtype=np.float64),kcpe,student_names)
+
+    def mask(self,**filters) -> np.ndarray:
+        """Rows matching every filter, e.g. mask(subject='MAT', score_type='KCSE').
+
+        A filter can be a label or a list of labels.
+        """
+        selected = np.ones(len(self),dtype=bool)
+        for category, wanted in filters.items():
+            if wanted is None:
+                continue
+            wanted = [wanted] if isinstance(wanted,str) else list(wanted)
+            wanted_codes = [self.labels[category].index(label) for label in wanted if label in self.labels[category]]
+            selected &= np.isin(self.codes[category],wanted_codes)
+        return selected
+
+    def group_mean(self,by:Sequence[str],**filters) -> List[Tuple]:
+        """Mean numeric score of every group of rows with the same labels in the by columns.
+
+        Returns:
+            List[Tuple]: (label for each by column..., mean, count of scores), in label order
+        """
+        selected = self.mask(**filters) & ~np.isnan(self.scores)
+        if not selected.any():
+            return []
+        dims = [len(self.labels[category]) for category in by]
+        keys = np.ravel_multi_index([self.codes[category][selected] for category in by],dims)
+        group_keys, group_idx = np.unique(keys,return_inverse=True)
+        counts = np.bincount(group_idx)
+        means = np.bincount(group_idx,weights=self.scores[selected]) / counts
+        results = []
+        for key_codes, mean, count in zip(zip(*np.unravel_index(group_keys,dims)),means,counts):
+            group_labels = tuple(self.labels[category][code] for category, code in zip(by,key_codes))
+            results.append(group_labels + (float(mean),int(count)))
+        return results
+
+    def class_means(self,**filters) -> List[Tuple]:
+        "Mean score per subject for each grad class, exam and date: (grad_class, score_type, date, subject, mean, count)"
+        return self.group_mean(('grad_class','score_type','date','subject'),**filters)
+
+    def trajectory(self,student:str,subject:str='Overall') -> List[Tuple[str,str,str,float]]:
+        """A student's scores in a subject over time.
+
+        Args:
+            student (str): the student's Airtable record ID
+            subject (str): subject, or 'Overall' for total points
+
+        Returns:
+            List[Tuple[str,str,str,float]]: (date, form, score type, score) in date order
+        """
+        rows = np.flatnonzero(self.mask(student=student,subject=subject) & ~np.isnan(self.scores))
+        rows = rows[np.argsort(self.codes['date'][rows],kind='stable')]
+        return [
+            (self.labels['date'][self.codes['date'][row]],self.labels['form'][self.codes['form'][row]],
+             self.labels['score_type'][self.codes['score_type'][row]],float(self.scores[row]))
+            for row in rows
+        ]
+
+    def kcpe_kcse_correlation(self,subject:str='Overall') -> Tuple[Optional[float],int]:
+        """Pearson correlation between students' KCPE score and their KCSE score in a subject.
+
+        Returns:
+            Tuple[Optional[float],int]: (correlation, or None with fewer than 3 students, number of students)
+        """
+        rows = np.flatnonzero(self.mask(score_type='KCSE',subject=subject) & ~np.isnan(self.scores))
+        students = [self.labels['student'][code] for code in self.codes['student'][rows]]
+        pairs = [(self.kcpe[student],score) for student, score in zip(students,self.scores[rows]) if student in self.kcpe]
+        if len(pairs) < 3:
+            return None, len(pairs)
+        kcpe, kcse = np.array(pairs).T
+        if kcpe.std() == 0 or kcse.std() == 0:
+            return None, len(pairs)
+        return float(np.corrcoef(kcpe,kcse)[0,1]), len(pairs)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reports over the Test Scores exported by export.py")
+    parser.add_argument(
+        "-e","--export-dir",
+        default=".export/",
+        help="Folder export.py wrote the tables to (default: .export/)"
+    )
+    parser.add_argument(
+        "-g","--grad-class",
+        default=None,
+        help="Only report on this grad class, e.g. 2025"
+    )
+    parser.add_argument(
+        "-s","--subject",
+        default=None,
+        help="Only report on this subject, e.g. MAT or Overall"
+    )
+    parser.add_argument(
+        "--student",
+        default=None,
+        help="Show the scores over time of the student with this Airtable ID number"
+    )
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    configure_logging()
+    store = GradeStore.from_export(args.export_dir)
+
+    if args.student is not None:
+        matches = [rec_id for rec_id, name in store.student_names.items() if name.split(' - ')[0] == args.student]
+        if not matches:
+            print(f"No student with ID {args.student} in the export.")
+            return
+        print(store.student_names[matches[0]])
+        print(tabulate(store.trajectory(matches[0],args.subject or 'Overall'),headers=['Date','Form','Score Type','Score'],floatfmt='.2f'))
+        return
+
+    means = store.class_means(grad_class=args.grad_class,subject=args.subject)
+    print(tabulate(means,headers=['Grad Class','Score Type','Date','Subject','Mean','Scores'],floatfmt='.2f'))
+    correlation, count = store.kcpe_kcse_correlation()
+    if correlation is None:
+        print(f"Not enough students with both KCPE and KCSE scores to correlate ({count}).")
+    else:
+        print(f"KCPE vs KCSE total points correlation: {correlation:.2f} over {count} students.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+# Shared logging setup for app.py and export.py
+#   console: messages only, like the print statements they replace
+#   -v shows per-cell parsing detail, -q shows warnings and a progress bar only
+#   --log-file writes every message (including detail) as JSON lines
+
+LOGGER_NAME = 'kgsa'
+log = logging.getLogger(LOGGER_NAME)
+
+_show_progress = False
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record:logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        # anything passed as extra={'data': {...}} is kept as structured fields
+        data = getattr(record, 'data', None)
+        if data is not None:
+            entry['data'] = data
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(verbose:bool=False, quiet:bool=False, log_file:str=None):
+    """Send kgsa log messages to the console, and optionally to a JSON lines file.
+
+    Args:
+        verbose (bool): also show debug detail such as every parsed grade
+        quiet (bool): only show warnings and errors, with a progress bar for long loops
+        log_file (str): path of a JSON lines file to append every message to
+    """
+    global _show_progress
+    _show_progress = quiet and not verbose
+
+    log.setLevel(logging.DEBUG)
+    log.propagate = False
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+        handler.close()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    if verbose:
+        console.setLevel(logging.DEBUG)
+    elif quiet:
+        console.setLevel(logging.WARNING)
+    else:
+        console.setLevel(logging.INFO)
+    log.addHandler(console)
+
+    if log_file is not None:
+        file_handler = logging.FileHandler(log_file, encoding='UTF-8')
+        file_handler.setFormatter(JsonLinesFormatter())
+        file_handler.setLevel(logging.DEBUG)
+        log.addHandler(file_handler)
+
+def debug_enabled() -> bool:
+    "Whether any handler keeps debug messages, so callers can skip building ones nobody sees"
+    return any(handler.level <= logging.DEBUG for handler in log.handlers)
+
+def progress(items, label:str, total:int=None):
+    """Yield from items, drawing a progress bar on stderr when logging is quiet."""
+    if not _show_progress:
+        yield from items
+        return
+    if total is None:
+        try:
+            total = len(items)
+        except TypeError:
+            total = None
+    done = 0
+    width = 30
+    for item in items:
+        yield item
+        done += 1
+        if total:
+            filled = int(width * done / total)
+            sys.stderr.write(f"\r{label} [{'#' * filled}{' ' * (width - filled)}] {done}/{total}")
+        else:
+            sys.stderr.write(f"\r{label} {done}")
+        sys.stderr.flush()
+    sys.stderr.write("\n")
+    sys.stderr.flush()
@@ -0,0 +1,20 @@
+# must move this file to the root directory to run effectively
+
+from app import initialize_airtable, grade_natural_key, GRADE_KEY_FIELD
+
+# HOW TO ADD THE IMPORT KEY FIELD TO TEST SCORES (NEEDED FOR python3 app.py -u)
+# creates the field if it's missing, then fills it in for every existing grade
+# so re-imported grades update the existing records instead of creating new ones
+b = initialize_airtable()
+grd = b.table('Test Scores')
+field_names = [field.name for field in grd.schema().fields]
+if GRADE_KEY_FIELD not in field_names:
+    grd.create_field(name=GRADE_KEY_FIELD,type='singleLineText',description='Student, form, score type, subject and date of score, set by the import tool')
+
+updates = []
+for rec in grd.all(fields=['Student ID','Form','Score Type','Subject','Date of Score',GRADE_KEY_FIELD]):
+    key = grade_natural_key(rec['fields'])
+    if rec['fields'].get(GRADE_KEY_FIELD) != key:
+        updates.append({'id': rec['id'], 'fields': {GRADE_KEY_FIELD: key}})
+grd.batch_update(updates)
+print(f"Set {GRADE_KEY_FIELD} on {len(updates)} Test Scores records.")